@@ -1,16 +1,28 @@
 # -*- coding: utf-8 -*-
+import dis
 import fnmatch
+import hashlib
 import itertools
+import math
 import multiprocessing
 import os
+import queue
+import random
 import re
+import selectors
 import shlex
+import signal
+import socket
 import subprocess
 import sys
+import threading
 import toml
+from bisect import bisect_left
+from collections import defaultdict, deque
 from configparser import ConfigParser
 from copy import copy as copy_obj
 from functools import wraps
+from multiprocessing.managers import BaseManager
 from io import (
     open,
     TextIOBase,
@@ -19,14 +31,19 @@ from os.path import isdir
 from shutil import (
     move,
     copy,
+    copy2,
+    rmtree,
 )
+from tempfile import mkdtemp
 from threading import (
     Timer,
     Thread,
 )
-from time import time
+from time import sleep, time
+from types import CodeType
 
 from parso import parse
+from parso.utils import split_lines
 from parso.python.tree import Name, Number, Keyword, FStringStart, FStringEnd
 
 __version__ = '2.4.3'
@@ -41,11 +58,19 @@ except ImportError:
 
 
 class RelativeMutationID(object):
-    def __init__(self, line, index, line_number, filename=None):
+    def __init__(self, line, index, line_number, filename=None, edit=None, mutation_type=None,
+                 scope_fingerprint=None, scope_position=None):
         self.line = line
         self.index = index
         self.line_number = line_number
         self.filename = filename
+        # (start_offset, end_offset, replacement) in the source, see apply_edit
+        self.edit = edit
+        # the key in mutations_by_type, set by list_mutations
+        self.mutation_type = mutation_type
+        # the code the mutant depends on and its place in there, set by list_mutations_of_file
+        self.scope_fingerprint = scope_fingerprint
+        self.scope_position = scope_position
 
     def __repr__(self):
         return 'MutationID(line="{}", index={}, line_number={}, filename={})'.format(self.line, self.index, self.line_number, self.filename)
@@ -110,9 +135,46 @@ class ASTPattern(object):
             raise InvalidASTPatternException("Found more than one match node. Match nodes are nodes with an empty name or with the explicit name 'match'")
         self.pattern = pattern_nodes[0]
         self.marker_type_by_id = {id(x['node']): x['marker_type'] for x in self.markers}
+        self.levels = self.compile_levels()
+
+    def compile_levels(self):
+        """The node types and number of children the match node and each of
+        its parents accept, from the match node up. :meth:`matches` checks these
+        cheaply before it walks the pattern.
+
+        :return: list of ``(accepted types or None for any, number of children or None for any)``
+        """
+        levels = []
+        pattern = self.pattern
+        while True:
+            if self.marker_type_by_id.get(id(pattern)) in (pattern.type, 'any'):
+                levels.append((None, None))
+            else:
+                if pattern.type == 'name' and pattern.value.startswith('_'):
+                    accepted_types = None if pattern.value == '_any' else {pattern.type, pattern.value[1:]}
+                else:
+                    accepted_types = {pattern.type}
+                number_of_children = len(pattern.children) if hasattr(pattern, 'children') else None
+                levels.append((accepted_types, number_of_children))
+            if pattern.parent.type == 'file_input':
+                return levels
+            pattern = pattern.parent
+
+    def may_match(self, node):
+        for accepted_types, number_of_children in self.levels:
+            if node is None:
+                return False
+            if accepted_types is not None and node.type not in accepted_types:
+                return False
+            if number_of_children is not None and len(getattr(node, 'children', ())) != number_of_children:
+                return False
+            node = node.parent
+        return True
 
     def matches(self, node, pattern=None, skip_child=None):
         if pattern is None:
+            if not self.may_match(node):
+                return False
             pattern = self.pattern
 
         check_value = True
@@ -179,12 +241,17 @@ class SkipException(Exception):
     pass
 
 
+class UnknownTestsException(Exception):
+    """pytest can't find some of the tests selected for a mutant"""
+
+
 UNTESTED = 'untested'
 OK_KILLED = 'ok_killed'
 OK_SUSPICIOUS = 'ok_suspicious'
 BAD_TIMEOUT = 'bad_timeout'
 BAD_SURVIVED = 'bad_survived'
 SKIPPED = 'skipped'
+OK_EQUIVALENT = 'ok_equivalent'
 
 
 MUTANT_STATUSES = {
@@ -193,6 +260,7 @@ MUTANT_STATUSES = {
     "suspicious": OK_SUSPICIOUS,
     "survived": BAD_SURVIVED,
     "skipped": SKIPPED,
+    "equivalent": OK_EQUIVALENT,
     "untested": UNTESTED,
 }
 
@@ -482,7 +550,7 @@ def should_exclude(context, config):
         covered_lines = config.covered_lines_by_filename[context.filename]
     except KeyError:
         if config.coverage_data is not None:
-            covered_lines = config.coverage_data.get(os.path.abspath(context.filename))
+            covered_lines = config.coverage_data.get(coverage_filename(config, context.filename))
             config.covered_lines_by_filename[context.filename] = covered_lines
         else:
             covered_lines = None
@@ -513,6 +581,11 @@ class Context(object):
         self._path_by_line = None
         self.config = config
         self.skip = False
+        self.killed_by = None
+        self.tests = None  # the tests that ran against the mutant, None for the whole suite
+        self.record_edits = False
+        self.module = None  # the parsed source, kept when the mutations are listed
+        self._line_offsets = None
 
     def exclude_line(self):
         return self.current_line_index in self.pragma_no_mutate_lines or should_exclude(context=self, config=self.config)
@@ -536,6 +609,15 @@ class Context(object):
             self._source_by_line_number = self.source.split('\n')
         return self._source_by_line_number
 
+    def offset_of(self, position):
+        """The offset in :attr:`source` of a parso ``(line, column)`` position"""
+        if self._line_offsets is None:
+            self._line_offsets = [0]
+            for line in split_lines(self.source, keepends=True):
+                self._line_offsets.append(self._line_offsets[-1] + len(line))
+        line, column = position
+        return self._line_offsets[line - 1] + column
+
     @property
     def current_source_line(self):
         return self.source_by_line_number[self.current_line_index]
@@ -568,20 +650,27 @@ def mutate(context):
     :return: tuple of mutated source code and number of mutations performed
     :rtype: Tuple[str, int]
     """
-    try:
-        result = parse(context.source, error_recovery=False)
-    except Exception:
-        print('Failed to parse {}. Internal error from parso follows.'.format(context.filename))
-        print('----------------------------------')
-        raise
-    mutate_list_of_nodes(result, context=context)
-    mutated_source = result.get_code().replace(' not not ', ' ')
+    if context.mutation_id != ALL and context.mutation_id.edit is not None:
+        # the mutant was listed by list_mutations, no need to parse the source again
+        mutated_source = apply_edit(context.source, context.mutation_id.edit)
+        context.performed_mutation_ids.append(context.mutation_id)
+    else:
+        try:
+            result = parse(context.source, error_recovery=False)
+        except Exception:
+            print('Failed to parse {}. Internal error from parso follows.'.format(context.filename))
+            print('----------------------------------')
+            raise
+        mutate_list_of_nodes(result, context=context)
+        if context.record_edits:
+            context.module = result
+        mutated_source = result.get_code().replace(' not not ', ' ')
     if context.remove_newline_at_end:
         assert mutated_source[-1] == '\n'
         mutated_source = mutated_source[:-1]
 
     # If we said we mutated the code, check that it has actually changed
-    if context.performed_mutation_ids:
+    if context.performed_mutation_ids and not context.record_edits:
         if context.source == mutated_source:
             raise RuntimeError(
                 "Mutation context states that a mutation occurred but the "
@@ -655,8 +744,13 @@ def mutate_node(node, context):
                     if hasattr(mutmut_config, 'pre_mutation_ast'):
                         mutmut_config.pre_mutation_ast(context=context)
                     if context.should_mutate(node):
-                        context.performed_mutation_ids.append(context.mutation_id_of_current_index)
-                        setattr(node, key, new)
+                        mutation_id = context.mutation_id_of_current_index
+                        if context.record_edits:
+                            mutation_id.edit = mutation_edit(node, key, new, context)
+                            mutation_id.mutation_type = node.type
+                        else:
+                            setattr(node, key, new)
+                        context.performed_mutation_ids.append(mutation_id)
                     context.index += 1
                 # this is just an optimization to stop early
                 if context.performed_mutation_ids and context.mutation_id != ALL:
@@ -688,11 +782,44 @@ def mutate_list_of_nodes(node, context):
             return
 
 
+def mutation_edit(node, key, new, context):
+    """The mutation of ``node`` as an edit of the original source, the tree is left unchanged
+
+    :type context: Context
+    :return: ``(start_offset, end_offset, replacement)``
+    :rtype: tuple[int, int, str]
+    """
+    start = context.offset_of(node.get_start_pos_of_prefix())
+    end = context.offset_of(node.end_pos)
+    old = getattr(node, key)
+    setattr(node, key, new)
+    try:
+        replacement = node.get_code(include_prefix=True)
+    finally:
+        setattr(node, key, old)
+    return start, end, replacement
+
+
+def apply_edit(source, edit):
+    """Apply an edit of :func:`mutation_edit` to ``source``
+
+    :type source: str
+    :type edit: tuple[int, int, str]
+    :rtype: str
+    """
+    start, end, replacement = edit
+    return (source[:start] + replacement + source[end:]).replace(' not not ', ' ')
+
+
 def list_mutations(context):
     """
     :type context: Context
+    :return: the mutation ids, each with the edit that applies it to the source
     """
     assert context.mutation_id == ALL
+    # every mutation is recorded as an edit of the unchanged tree, so that
+    # applying a mutant later doesn't need to parse the source again
+    context.record_edits = True
     mutate(context)
     return context.performed_mutation_ids
 
@@ -710,76 +837,248 @@ def mutate_file(backup, context):
         with open(context.filename + '.bak', 'w') as f:
             f.write(original)
     mutated, _ = mutate(context)
+    if os.stat(context.filename).st_nlink > 1:
+        # The file is hard linked from a worker workspace, break the link so
+        # we don't write the mutant through to the original source tree
+        os.remove(context.filename)
     with open(context.filename, 'w') as f:
         f.write(mutated)
     return original, mutated
 
 
-def queue_mutants(*, progress, config, mutants_queue, mutations_by_file):
+def read_sources(mutations_by_file):
+    """The files to mutate and their sources, in the order of ``mutations_by_file``.
+    This is sent to every worker once, the mutants refer to the files by index.
+
+    :type mutations_by_file: dict[str, list[RelativeMutationID]]
+    :rtype: list[tuple[str, str]]
+    """
+    result = []
+    for filename in mutations_by_file:
+        with open(filename) as f:
+            result.append((filename, f.read()))
+    return result
+
+
+def mutant_context(config, files, descriptor):
+    """The :class:`Context` of a mutant from the queue
+
+    :type config: Config
+    :param files: the result of :func:`read_sources`
+    :type files: list[tuple[str, str]]
+    :param descriptor: the mutant as ``(file_id, line_number, index, edit)``,
+        ``edit`` is the one of :func:`mutation_edit` or :obj:`None`
+    :type descriptor: tuple[int, int, int, tuple[int, int, str] | None]
+    :rtype: Context
+    """
+    file_id, line_number, index, edit = descriptor
+    filename, source = files[file_id]
+    context = Context(
+        filename=filename,
+        dict_synonyms=config.dict_synonyms,
+        config=copy_obj(config),
+        source=source,
+    )
+    context.mutation_id = RelativeMutationID(
+        line=context.source_by_line_number[line_number],
+        index=index,
+        line_number=line_number,
+        filename=filename,
+        edit=edit,
+    )
+    return context
+
+
+def queue_mutants(*, progress, config, mutants_queue, mutations_by_file, number_of_workers=1):
     from mutmut.cache import get_cached_mutation_statuses
 
     try:
-        index = 0
-        for filename, mutations in mutations_by_file.items():
-            cached_mutation_statuses = get_cached_mutation_statuses(filename, mutations, config.hash_of_tests)
-            with open(filename) as f:
-                source = f.read()
+        for file_id, (filename, mutations) in enumerate(mutations_by_file.items()):
+            cached_mutation_statuses = get_cached_mutation_statuses(filename, mutations, config.hash_of_tests, config.test_file_hashes)
             for mutation_id in mutations:
                 cached_status = cached_mutation_statuses.get(mutation_id)
+                if cached_status == OK_EQUIVALENT and not config.detect_equivalent:
+                    cached_status = UNTESTED
                 if cached_status != UNTESTED:
                     progress.register(cached_status)
                     continue
-                context = Context(
-                    mutation_id=mutation_id,
-                    filename=filename,
-                    dict_synonyms=config.dict_synonyms,
-                    config=copy_obj(config),
-                    source=source,
-                    index=index,
-                )
-                mutants_queue.put(('mutant', context))
-                index += 1
+                mutants_queue.put(('mutant', (file_id, mutation_id.line_number, mutation_id.index, mutation_id.edit)))
     finally:
-        mutants_queue.put(('end', None))
+        for _ in range(number_of_workers):
+            mutants_queue.put(('end', None))
+
 
+def check_mutants(mutants_queue, results_queue, cycle_process_after, config, files, workspace=None):
+    """Test the mutants from ``mutants_queue`` until the end or until it's
+    time to cycle the process
 
-def check_mutants(mutants_queue, results_queue, cycle_process_after):
+    :param config: the config of the run, sent once per worker
+    :param files: the result of :func:`read_sources`, sent once per worker
+    """
     def feedback(line):
         results_queue.put(('progress', line, None, None))
 
+    if workspace is not None:
+        enter_workspace(workspace)
+
     did_cycle = False
 
     try:
         count = 0
         while True:
-            command, context = mutants_queue.get()
+            command, descriptor = mutants_queue.get()
             if command == 'end':
                 break
 
+            context = mutant_context(config, files, descriptor)
             status = run_mutation(context, feedback)
 
+            if context.killed_by is not None:
+                results_queue.put(('killed_by', context.killed_by, context.filename, context.mutation_id))
+            if context.tests is not None:
+                results_queue.put(('tests', context.tests, context.filename, context.mutation_id))
             results_queue.put(('status', status, context.filename, context.mutation_id))
             count += 1
             if count == cycle_process_after:
-                results_queue.put(('cycle', None, None, None))
+                results_queue.put(('cycle', workspace, None, None))
                 did_cycle = True
                 break
     finally:
+        from mutmut.schemata import restore_instrumented_files
+        from mutmut.importhook import remove_hook_directory
+        restore_instrumented_files()
+        remove_hook_directory()
         if not did_cycle:
             results_queue.put(('end', None, None, None))
 
 
-def run_mutation(context: Context, callback) -> str:
+# what killed the mutants that were never tested, instead of a test id
+KILLED_BY_COMPILE_ERROR = '(compile error)'
+KILLED_BY_IMPORT_ERROR = '(import error)'
+
+IMPORT_MODULE_COMMAND = 'import importlib, sys; importlib.import_module(sys.argv[1])'
+
+_original_compiles = {}
+_original_imports = {}
+
+
+def compiles(source, filename):
+    try:
+        compile(source, filename, 'exec', dont_inherit=True)
+    except (SyntaxError, ValueError):
+        return False
+    return True
+
+
+def mutated_source(context):
+    """The mutant of ``context``, without touching ``context`` or the file"""
+    mutated, _ = mutate(Context(
+        source=context.source,
+        filename=context.filename,
+        mutation_id=context.mutation_id,
+        dict_synonyms=context.dict_synonyms,
+        config=context.config,
+    ))
+    return mutated
+
+
+def compile_fails(context):
+    """:return: :obj:`True` if the mutant doesn't compile, but the original source does"""
+    source, original_compiles = _original_compiles.get(context.filename, (None, None))
+    if source != context.source:
+        original_compiles = compiles(context.source, context.filename)
+        _original_compiles[context.filename] = context.source, original_compiles
+    return original_compiles and not compiles(mutated_source(context), context.filename)
+
+
+def module_name_and_root(filename):
+    """The dotted name of the module in ``filename`` and the directory it's
+    imported from, above all the packages it's in
+
+    :rtype: tuple[str, str]
     """
-    :return: (computed or cached) status of the tested mutant, one of mutant_statuses
+    directory, tail = os.path.split(os.path.abspath(filename))
+    parts = [os.path.splitext(tail)[0]]
+    if parts == ['__init__']:
+        parts = []
+    while os.path.exists(os.path.join(directory, '__init__.py')):
+        directory, package = os.path.split(directory)
+        parts.insert(0, package)
+    return '.'.join(parts), directory
+
+
+def imports(filename, timeout):
+    """Import the module in ``filename`` in a fresh interpreter, with whatever
+    mutant is active in the import hook
+
+    :raises TimeoutError: if the import doesn't finish within ``timeout`` seconds
     """
-    from mutmut.cache import cached_mutation_status
-    cached_status = cached_mutation_status(context.filename, context.mutation_id, context.config.hash_of_tests)
+    module_name, root = module_name_and_root(filename)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(x for x in [root, env.get('PYTHONPATH')] if x)
+    try:
+        return subprocess.run(
+            [sys.executable, '-c', IMPORT_MODULE_COMMAND, module_name],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout,
+        ).returncode == 0
+    except subprocess.TimeoutExpired as e:
+        raise TimeoutError() from e
+
+
+def import_fails(context, timeout):
+    """:return: :obj:`True` if importing the mutant fails, but importing the original module works
+
+    :raises TimeoutError: if the import of the mutant doesn't finish within ``timeout`` seconds
+    """
+    from mutmut.importhook import activate_mutant, deactivate_mutant
+
+    if context.filename not in _original_imports:
+        try:
+            _original_imports[context.filename] = imports(context.filename, timeout)
+        except TimeoutError:
+            _original_imports[context.filename] = False
+    if not _original_imports[context.filename]:
+        return False
+
+    activate_mutant(context)
+    try:
+        return not imports(context.filename, timeout)
+    finally:
+        deactivate_mutant()
 
-    if cached_status != UNTESTED and context.config.total != 1:
-        return cached_status
 
+def run_mutation(context: Context, callback) -> str:
+    """
+    :return: (computed or cached) status of the tested mutant, one of mutant_statuses
+    """
+    from mutmut.cache import killing_tests
     config = context.config
+    # a remote worker of a served run has no cache, it belongs to the coordinator
+    use_cache = config.serve_address is None
+
+    # the cached status was checked when the mutant was queued, see queue_mutants
+    killers_test_command = None
+    killers_timeout = timeout = None
+    if TESTS_PLACEHOLDER in config.test_command:
+        killers = killing_tests(context.filename, context.mutation_id.line_number) if use_cache else []
+        tests = covering_tests(context)
+        if tests:
+            tests = killers_first(tests, killers)
+            timeout = mutant_timeout(config, tests)
+            context.tests = tests
+        elif killers:
+            # without coverage data the whole suite runs, try the likely killers before that
+            killers_test_command = format_test_command(config.test_command, killers)
+            killers_timeout = mutant_timeout(config, killers)
+        config.test_command = format_test_command(config.test_command, tests)
+    expanded_test_command = config.test_command
+
+    output = []
+
+    def record(line):
+        output.append(line)
+        callback(line)
+
     if hasattr(mutmut_config, 'pre_mutation'):
         context.current_line_index = context.mutation_id.line_number
         try:
@@ -789,27 +1088,73 @@ def run_mutation(context: Context, callback) -> str:
         if context.skip:
             return SKIPPED
 
+    # broken mutants are killed without running the tests
+    if compile_fails(context):
+        context.killed_by = KILLED_BY_COMPILE_ERROR
+        return OK_KILLED
+    if config.check_import:
+        try:
+            if import_fails(context, timeout=config.baseline_time_elapsed * 10):
+                context.killed_by = KILLED_BY_IMPORT_ERROR
+                return OK_KILLED
+        except TimeoutError:
+            return BAD_TIMEOUT
+
     if config.pre_mutation:
         result = subprocess.check_output(config.pre_mutation, shell=True).decode().strip()
         if result and not config.swallow_output:
             callback(result)
 
+    in_place = True
+    if config.use_schemata:
+        from mutmut.schemata import activate_mutant, deactivate_mutant
+        in_place = not activate_mutant(context)
+    elif config.use_import_hook:
+        from mutmut.importhook import activate_mutant, deactivate_mutant
+        activate_mutant(context)
+        in_place = False
+
     try:
-        mutate_file(
-            backup=True,
-            context=context
-        )
+        if in_place:
+            mutate_file(
+                backup=True,
+                context=context
+            )
         start = time()
         try:
-            survived = tests_pass(config=config, callback=callback)
-            if survived and config.test_command != config._default_test_command and config.rerun_all:
+            survived = True
+            if config.test_command != expanded_test_command:
+                # a hook changed the command, we don't know which tests run anymore
+                killers_test_command = timeout = context.tests = None
+            full_test_command = format_test_command(config._default_test_command, [])
+            if killers_test_command is not None:
+                config.test_command = killers_test_command
+                try:
+                    survived = tests_pass(config=config, callback=record, timeout=killers_timeout)
+                except UnknownTestsException:
+                    # a killing test was renamed or removed, the whole suite runs next anyway
+                    survived = True
+                config.test_command = expanded_test_command
+            if survived:
+                try:
+                    survived = tests_pass(config=config, callback=record, timeout=timeout)
+                except UnknownTestsException:
+                    # the coverage data is older than the tests, run the whole suite instead
+                    config.test_command = full_test_command
+                    context.tests = None
+                    survived = tests_pass(config=config, callback=record)
+            if survived and config.test_command != full_test_command and config.rerun_all:
                 # rerun the whole test suite to be sure the mutant can not be killed by other tests
-                config.test_command = config._default_test_command
-                survived = tests_pass(config=config, callback=callback)
+                config.test_command = full_test_command
+                context.tests = None
+                survived = tests_pass(config=config, callback=record)
         except TimeoutError:
             return BAD_TIMEOUT
 
         time_elapsed = time() - start
+        if not survived:
+            context.killed_by = killed_by_from_output(output)
+
         if not survived and time_elapsed > config.test_time_base + (config.baseline_time_elapsed * config.test_time_multipler):
             return OK_SUSPICIOUS
 
@@ -821,7 +1166,10 @@ def run_mutation(context: Context, callback) -> str:
         return SKIPPED
 
     finally:
-        move(context.filename + '.bak', context.filename)
+        if in_place:
+            move(context.filename + '.bak', context.filename)
+        else:
+            deactivate_mutant()
         config.test_command = config._default_test_command  # reset test command to its default in the case it was altered in a hook
 
         if config.post_mutation:
@@ -835,7 +1183,10 @@ class Config(object):
                  baseline_time_elapsed, test_time_multiplier, test_time_base,
                  dict_synonyms, total, using_testmon,
                  tests_dirs, hash_of_tests, pre_mutation, post_mutation,
-                 coverage_data, paths_to_mutate, mutation_types_to_apply, no_progress, ci, rerun_all):
+                 coverage_data, paths_to_mutate, mutation_types_to_apply, no_progress, ci, rerun_all,
+                 jobs=1, use_schemata=False, use_fork_server=False, test_durations=None,
+                 use_import_hook=False, serve_address=None, detect_equivalent=False, check_import=False,
+                 test_file_hashes=None, project_dir=None):
         self.swallow_output = swallow_output
         self.test_command = self._default_test_command = test_command
         self.covered_lines_by_filename = covered_lines_by_filename
@@ -855,12 +1206,28 @@ class Config(object):
         self.no_progress = no_progress
         self.ci = ci
         self.rerun_all = rerun_all
-
-
-def tests_pass(config: Config, callback) -> bool:
+        self.jobs = jobs
+        self.use_schemata = use_schemata
+        self.use_fork_server = use_fork_server
+        self.test_durations = test_durations
+        self.use_import_hook = use_import_hook
+        self.serve_address = serve_address
+        self.detect_equivalent = detect_equivalent
+        self.check_import = check_import
+        self.test_file_hashes = test_file_hashes
+        # workers run in a workspace, the coverage data has the paths of the project
+        self.project_dir = project_dir if project_dir is not None else os.getcwd()
+
+
+def tests_pass(config: Config, callback, timeout=None) -> bool:
     """
+    :param timeout: seconds before the test run is considered hanging,
+        defaults to ten times the baseline run of the entire test suite
     :return: :obj:`True` if the tests pass, otherwise :obj:`False`
     """
+    if timeout is None:
+        timeout = config.baseline_time_elapsed * 10
+
     if config.using_testmon:
         copy('.testmondata-initial', '.testmondata')
 
@@ -868,12 +1235,166 @@ def tests_pass(config: Config, callback) -> bool:
 
     # Special case for hammett! We can do in-process test running which is much faster
     if use_special_case and config.test_command.startswith(hammett_prefix):
-        return hammett_tests_pass(config, callback)
+        return hammett_tests_pass(config, callback, timeout)
+
+    # Fork a child of a process that has already imported the test suite
+    if config.use_fork_server and config.test_command.startswith(pytest_prefix) and hasattr(os, 'fork'):
+        return pytest_fork_server_tests_pass(config, callback, timeout)
 
-    returncode = popen_streaming_output(config.test_command, callback, timeout=config.baseline_time_elapsed * 10)
+    # the output of pytest is kept even when swallowed, it tells which test killed the mutant
+    discard_output = config.swallow_output and not config.test_command.startswith(pytest_prefix)
+    returncode = popen_streaming_output(config.test_command, callback, timeout=timeout, discard_output=discard_output)
+    if config.test_command.startswith(pytest_prefix):
+        return pytest_tests_pass(config, returncode)
     return returncode != 1
 
 
+def pytest_tests_pass(config, returncode):
+    """
+    :param returncode: the exit code of pytest
+    :raises UnknownTestsException: if pytest didn't find the selected tests
+    :return: :obj:`True` if the tests pass, otherwise :obj:`False`
+    """
+    if returncode == PYTEST_USAGE_ERROR and config.test_command != format_test_command(config._default_test_command, []):
+        # "ERROR: not found: ... (no match in any of [<Module ...>])"
+        raise UnknownTestsException(config.test_command)
+    return returncode not in PYTEST_FAILED
+
+
+TESTS_PLACEHOLDER = '{tests}'
+
+
+def coverage_context_to_test_id(coverage_context):
+    """Convert a coverage context to a test id for the runner
+
+    ``pytest-cov`` (with ``--cov-context=test``) records contexts like
+    ``tests/test_foo.py::test_foo|run``, the part after ``|`` is the test phase.
+    """
+    return coverage_context.partition('|')[0]
+
+
+def coverage_filename(config, filename):
+    """The path of ``filename`` in the coverage data
+
+    The coverage data is recorded in the project directory, not in the
+    workspace of a worker, so relative paths are resolved against
+    :attr:`Config.project_dir`.
+
+    :type config: Config
+    :type filename: str
+    :rtype: str
+    """
+    return os.path.abspath(os.path.join(config.project_dir, filename))
+
+
+def covering_tests(context):
+    """The tests whose coverage contexts cover the line of the mutant
+
+    :type context: Context
+    :return: sorted list of test ids, empty if there is no coverage data
+    :rtype: list[str]
+    """
+    coverage_data = context.config.coverage_data
+    if coverage_data is None:
+        return []
+    contexts_by_lineno = coverage_data.get(coverage_filename(context.config, context.filename)) or {}
+    contexts = contexts_by_lineno.get(context.mutation_id.line_number + 1, [])
+    return sorted({coverage_context_to_test_id(x) for x in contexts if x})
+
+
+def format_test_command(test_command, tests):
+    """Replace the ``{tests}`` placeholder in ``test_command``
+
+    An empty list of tests means running the entire test suite.
+
+    :type test_command: str
+    :type tests: list[str]
+    :rtype: str
+    """
+    return test_command.replace(TESTS_PLACEHOLDER, ' '.join(shlex.quote(x) for x in tests))
+
+
+def killers_first(tests, killers):
+    """Order ``tests`` so the tests in ``killers`` run first, in the order of ``killers``
+
+    :type tests: list[str]
+    :type killers: list[str]
+    :rtype: list[str]
+    """
+    rank = {test: i for i, test in enumerate(killers)}
+    return sorted(tests, key=lambda x: rank.get(x, len(rank)))
+
+
+def strip_ansi_codes(line):
+    # the tests run in a pseudo terminal, so the output can be colored
+    return re.sub(r'\x1b\[[0-9;]*m', '', line).rstrip()
+
+
+def killed_by_from_output(output):
+    """Find the first failed test in the output of a pytest run
+
+    :type output: list[str]
+    :return: the node id of the test, or :obj:`None`
+    :rtype: str | None
+    """
+    for line in output:
+        match = re.match(r'FAILED (\S+?)(?: - .*)?$', strip_ansi_codes(line))
+        if match:
+            return match.group(1)
+    return None
+
+
+def pytest_durations_arguments():
+    """The arguments that make pytest print the duration of every test
+
+    ``--durations-min`` needs pytest 6.2, older versions hide the durations
+    under 5 ms. Tests without a duration get the timeout of the whole suite,
+    see :func:`mutant_timeout`.
+    """
+    try:
+        import pytest
+        version = tuple(int(x) for x in pytest.__version__.split('.')[:2])
+    except (ImportError, ValueError):
+        version = (0, 0)
+    if version >= (6, 2):
+        return ' --durations=0 --durations-min=0'
+    return ' --durations=0'
+
+
+def durations_from_output(output):
+    """Sum up the setup, call and teardown times of every test in the output
+    of a pytest run with ``--durations=0``
+
+    :type output: list[str]
+    :return: seconds by test id
+    :rtype: dict[str, float]
+    """
+    durations = {}
+    for line in output:
+        match = re.match(r'([0-9.]+)s (?:setup|call|teardown) +(.+)$', strip_ansi_codes(line))
+        if match:
+            test_id = match.group(2)
+            durations[test_id] = durations.get(test_id, 0.0) + float(match.group(1))
+    return durations
+
+
+def mutant_timeout(config, tests):
+    """The time after which testing a mutant against ``tests`` is aborted:
+    ten times the runner overhead of the baseline plus the baseline durations
+    of ``tests``
+
+    :type config: Config
+    :type tests: list[str]
+    :return: the timeout in seconds, or :obj:`None` if the durations of ``tests`` aren't known
+    :rtype: float | None
+    """
+    durations = config.test_durations
+    if not durations or not tests or any(test not in durations for test in tests):
+        return None
+    overhead = max(config.baseline_time_elapsed - sum(durations.values()), 0.0)
+    return (overhead + sum(durations[test] for test in tests)) * 10
+
+
 def config_from_file(**defaults):
     def config_from_pyproject_toml() -> dict:
         try:
@@ -960,12 +1481,13 @@ class Progress(object):
         self.surviving_mutants = 0
         self.surviving_mutants_timeout = 0
         self.suspicious_mutants = 0
+        self.equivalent_mutants = 0
         self.no_progress = no_progress
 
     def print(self):
         if self.no_progress:
             return
-        print_status('{}/{}  {} {}  {} {}  {} {}  {} {}  {} {}'.format(
+        print_status('{}/{}  {} {}  {} {}  {} {}  {} {}  {} {}  {} {}'.format(
             self.progress,
             self.total,
             self.output_legend["killed"],
@@ -977,7 +1499,9 @@ class Progress(object):
             self.output_legend["survived"],
             self.surviving_mutants,
             self.output_legend["skipped"],
-            self.skipped)
+            self.skipped,
+            self.output_legend["equivalent"],
+            self.equivalent_mutants)
         )
 
     def register(self, status):
@@ -991,6 +1515,8 @@ class Progress(object):
             self.suspicious_mutants += 1
         elif status == SKIPPED:
             self.skipped += 1
+        elif status == OK_EQUIVALENT:
+            self.equivalent_mutants += 1
         else:
             raise ValueError('Unknown status returned from run_mutation: {}'.format(status))
         self.progress += 1
@@ -1009,7 +1535,38 @@ def get_mutations_by_file_from_cache(mutation_pk):
     return {filename: [mutation_id]}
 
 
-def popen_streaming_output(cmd, callback, timeout=None):
+def stream_output(fd, callback, deadline=None):
+    """Call ``callback`` for every line read from ``fd`` until the end of the
+    stream, waiting in a selector instead of blocking on reads.
+
+    :param deadline: :func:`time.time` after which to give up
+    :type deadline: float | None
+
+    :raises TimeoutError: if the stream didn't end before ``deadline``
+    """
+    buffer = b''
+    with selectors.DefaultSelector() as selector:
+        selector.register(fd, selectors.EVENT_READ)
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time()
+                if remaining <= 0:
+                    raise TimeoutError()
+            if not selector.select(remaining):
+                continue
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                callback(line.decode('utf-8', 'replace') + '\n')
+    if buffer:
+        callback(buffer.decode('utf-8', 'replace'))
+
+
+def popen_streaming_output(cmd, callback, timeout=None, discard_output=False):
     """Open a subprocess and stream its output without hard-blocking.
 
     :param cmd: the command to execute within the subprocess
@@ -1022,29 +1579,53 @@ def popen_streaming_output(cmd, callback, timeout=None):
     :param timeout: the timeout time of the subprocess
     :type timeout: float
 
+    :param discard_output: if :obj:`True` the output goes to the null device
+        and ``callback`` is never called
+    :type discard_output: bool
+
     :raises TimeoutError: if the subprocess' execution time exceeds
-        the timeout time
+        the timeout time, the subprocess and all its children are killed
 
     :return: the return code of the executed subprocess
     :rtype: int
     """
     if os.name == 'nt':  # pragma: no cover
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            shell=True,
-        )
-        stdout = process.stdout
-    else:
-        master, slave = os.openpty()
-        process = subprocess.Popen(
-            shlex.split(cmd, posix=True),
-            stdout=slave,
-            stderr=slave
-        )
-        stdout = os.fdopen(master)
-        os.close(slave)
+        return popen_streaming_output_windows(cmd, callback, timeout)
+
+    deadline = None if timeout is None else time() + timeout
+    process = subprocess.Popen(
+        shlex.split(cmd, posix=True),
+        stdout=subprocess.DEVNULL if discard_output else subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        # a session of its own, so a timeout can kill the process group
+        start_new_session=True,
+    )
+    try:
+        if not discard_output:
+            stream_output(process.stdout.fileno(), callback, deadline)
+        process.wait(timeout=None if deadline is None else max(deadline - time(), 0))
+    except (TimeoutError, subprocess.TimeoutExpired):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        process.wait()
+        raise TimeoutError("subprocess running command '{}' timed out after {} seconds".format(cmd, timeout))
+    finally:
+        if process.stdout is not None:
+            process.stdout.close()
+
+    return process.returncode
+
+
+def popen_streaming_output_windows(cmd, callback, timeout=None):  # pragma: no cover
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        shell=True,
+    )
+    stdout = process.stdout
 
     def kill(process_):
         """Kill the specified process on Timer completion"""
@@ -1053,31 +1634,17 @@ def popen_streaming_output(cmd, callback, timeout=None):
         except OSError:
             pass
 
-    # python 2-3 agnostic process timer
     timer = Timer(timeout, kill, [process])
     timer.daemon = True
     timer.start()
 
     while process.returncode is None:
-        try:
-            if os.name == 'nt':  # pragma: no cover
-                line = stdout.readline()
-                # windows gives readline() raw stdout as a b''
-                # need to decode it
-                line = line.decode("utf-8")
-                if line:  # ignore empty strings and None
-                    callback(line)
-            else:
-                while True:
-                    line = stdout.readline()
-                    if not line:
-                        break
-                    callback(line)
-        except OSError:
-            # This seems to happen on some platforms, including TravisCI.
-            # It seems like it's ok to just let this pass here, you just
-            # won't get as nice feedback.
-            pass
+        line = stdout.readline()
+        # windows gives readline() raw stdout as a b''
+        # need to decode it
+        line = line.decode("utf-8")
+        if line:  # ignore empty strings and None
+            callback(line)
         if not timer.is_alive():
             raise TimeoutError("subprocess running command '{}' timed out after {} seconds".format(cmd, timeout))
         process.poll()
@@ -1088,7 +1655,7 @@ def popen_streaming_output(cmd, callback, timeout=None):
     return process.returncode
 
 
-def hammett_tests_pass(config, callback):
+def hammett_tests_pass(config, callback, timeout):
     # noinspection PyUnresolvedReferences
     from hammett import main_cli
     modules_before = set(sys.modules.keys())
@@ -1103,13 +1670,13 @@ def hammett_tests_pass(config, callback):
 
     timed_out = False
 
-    def timeout():
+    def on_timeout():
         _thread.interrupt_main()
         nonlocal timed_out
         timed_out = True
 
     assert current_thread() is main_thread()
-    timer = Timer(config.baseline_time_elapsed * 10, timeout)
+    timer = Timer(timeout, on_timeout)
     timer.daemon = True
     timer.start()
 
@@ -1141,15 +1708,237 @@ def hammett_tests_pass(config, callback):
 
     return returncode == 0
 
+
+_fork_server_warmed_up = False
+
+
+def is_project_module(module):
+    """Modules that must be imported again for every mutant: everything
+    loaded from the current directory that isn't an installed package"""
+    filename = getattr(module, '__file__', None)
+    if not filename:
+        return False
+    filename = os.path.abspath(filename)
+    return filename.startswith(os.getcwd() + os.sep) and 'site-packages' not in filename
+
+
+def unload_project_modules():
+    for module_name, module in list(sys.modules.items()):
+        if is_project_module(module):
+            del sys.modules[module_name]
+
+
+def _redirect_output(fd):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(fd, 1)
+    os.dup2(fd, 2)
+
+
+def pytest_fork_server_tests_pass(config, callback, timeout):
+    """Run pytest in a forked child of this (warm) process
+
+    The first call imports pytest, the test suite and all its dependencies by
+    collecting the tests. The project modules are then unloaded again, so every
+    forked child only imports the (mutated) project code and the test modules
+    before running the tests.
+
+    :return: :obj:`True` if the tests pass, otherwise :obj:`False`
+    """
+    # noinspection PyPackageRequirements
+    import pytest
+
+    global _fork_server_warmed_up
+    args = shlex.split(config.test_command[len(pytest_prefix):])
+
+    if not _fork_server_warmed_up:
+        saved_stdout, saved_stderr = os.dup(1), os.dup(2)
+        with open(os.devnull, 'w') as devnull:
+            _redirect_output(devnull.fileno())
+            try:
+                pytest.main(args + ['--collect-only', '-q'])
+            finally:
+                os.dup2(saved_stdout, 1)
+                os.dup2(saved_stderr, 2)
+                os.close(saved_stdout)
+                os.close(saved_stderr)
+        unload_project_modules()
+        _fork_server_warmed_up = True
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover (runs in the child)
+        returncode = 1
+        try:
+            os.close(read_fd)
+            _redirect_output(write_fd)
+            returncode = int(pytest.main(args))
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(returncode)
+
+    os.close(write_fd)
+    try:
+        stream_output(read_fd, callback, deadline=time() + timeout)
+    except TimeoutError:
+        os.kill(pid, signal.SIGKILL)
+        raise TimeoutError('forked tests timed out after {} seconds'.format(timeout))
+    finally:
+        os.close(read_fd)
+        _, status = os.waitpid(pid, 0)
+
+    returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 1
+    return pytest_tests_pass(config, returncode)
+
+
 CYCLE_PROCESS_AFTER = 100
 
+# Files and directories that are never copied into a worker workspace
+# only skipped at the top of the project, a package or a test fixture with the
+# same name further down is part of what the tests need
+WORKSPACE_EXCLUDE = ['.mutmut-cache', '.git', '.hg', '.tox', '.nox', 'venv', '.venv', 'node_modules']
+
+
+def create_workspace(source_dir='.', tests_dirs=()):
+    """Create a private copy of the project tree for a worker process
+
+    Python files outside of ``tests_dirs`` are hard linked (or copied if the
+    file system doesn't support hard links), everything else is copied so tests
+    writing to their fixtures can't touch the original tree. :func:`mutate_file`
+    breaks the hard link of the file it mutates, so the mutated file is the
+    only python file written as a real file. A test that writes to a python
+    file outside of the test directories still writes to the original tree.
+
+    :param source_dir: the directory to copy
+    :type source_dir: str
+    :param tests_dirs: the test directories, relative to ``source_dir``
+    :type tests_dirs: list[str]
+
+    :return: the path of the new workspace
+    :rtype: str
+    """
+    tests_dirs = [os.path.relpath(x, source_dir) for x in tests_dirs]
+    workspace = mkdtemp(prefix='mutmut-workspace-')
+    for root, dirs, files in os.walk(source_dir, topdown=True):
+        excluded = WORKSPACE_EXCLUDE if root == source_dir else []
+        relative_root = os.path.relpath(root, source_dir)
+        in_tests_dir = any(relative_root == x or relative_root.startswith(x + os.sep) for x in tests_dirs)
+        # the workers write their own bytecode
+        dirs[:] = [d for d in dirs if d not in excluded and d != '__pycache__']
+        target_root = os.path.join(workspace, relative_root)
+        os.makedirs(target_root, exist_ok=True)
+        for filename in files:
+            if filename in excluded:
+                continue
+            source = os.path.join(root, filename)
+            target = os.path.join(target_root, filename)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+                continue
+            if filename.endswith('.py') and not in_tests_dir:
+                try:
+                    os.link(source, target)
+                    continue
+                except OSError:
+                    pass
+            copy2(source, target)
+    return workspace
+
+
+def workspace_path(path, original_dir, workspace):
+    """The copy of ``path`` in ``workspace``, or ``path`` itself if it's
+    not in ``original_dir`` or has no copy
+
+    :type path: str
+    :type original_dir: str
+    :type workspace: str
+    :rtype: str
+    """
+    try:
+        relative = os.path.relpath(path, original_dir)
+    except ValueError:
+        # another drive on windows
+        return path
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return path
+    copy_path = os.path.normpath(os.path.join(workspace, relative))
+    return copy_path if os.path.exists(copy_path) else path
+
+
+def enter_workspace(workspace):
+    """Make the current (worker) process run everything inside ``workspace``
+
+    The cache is bound before changing directory so all workers share the
+    cache of the original project. The ``sys.path`` entries in the original
+    project (like a ``src`` directory, also from an editable install) are
+    replaced by their copies, and put in front of ``PYTHONPATH`` so the test
+    command imports the copies too.
+    """
+    from mutmut.cache import bind_cache
+    bind_cache()
+
+    original_dir = os.getcwd()
+    os.chdir(workspace)
+    copies = []
+    for i, path in enumerate(sys.path):
+        # relative entries follow the current directory by themselves
+        if not os.path.isabs(path):
+            continue
+        copy_path = workspace_path(path, original_dir, workspace)
+        if copy_path != path:
+            sys.path[i] = copy_path
+            copies.append(copy_path)
+    if copies:
+        python_path = os.environ.get('PYTHONPATH')
+        os.environ['PYTHONPATH'] = os.pathsep.join(copies + ([python_path] if python_path else []))
+
+
+def handle_result(config, progress, killed_by, tests, statuses, command, status, filename, mutation_id):
+    """Handle a ``progress``, ``killed_by``, ``tests`` or ``status`` message of a worker
+
+    :param killed_by: killing tests that wait for the status of their mutant
+    :type killed_by: dict[tuple[str, RelativeMutationID], str]
+    :param tests: the tests that ran against a mutant, waiting for its status
+    :type tests: dict[tuple[str, RelativeMutationID], list[str]]
+    :type statuses: mutmut.cache.MutantStatusWriter
+    """
+    if command == 'killed_by':
+        # status is the id of the killing test here, it's stored with the status that follows
+        killed_by[filename, mutation_id] = status
+
+    elif command == 'tests':
+        tests[filename, mutation_id] = status
+
+    elif command == 'progress':
+        if not config.swallow_output:
+            print(status, end='', flush=True)
+        elif not config.no_progress:
+            progress.print()
+
+    else:
+        assert command == 'status'
+
+        progress.register(status)
+
+        statuses.add(
+            filename=filename,
+            mutation_id=mutation_id,
+            status=status,
+            killed_by=killed_by.pop((filename, mutation_id), None),
+            tests=tests.pop((filename, mutation_id), None),
+        )
+
+
 def run_mutation_tests(config, progress, mutations_by_file):
     """
     :type config: Config
     :type progress: Progress
     :type mutations_by_file: dict[str, list[RelativeMutationID]]
     """
-    from mutmut.cache import update_mutant_status
+    from mutmut.cache import MutantStatusWriter, STATUS_FLUSH_INTERVAL
+
+    number_of_workers = max(config.jobs, 1)
 
     # Need to explicitly use the spawn method for python < 3.8 on macOS
     mp_ctx = multiprocessing.get_context('spawn')
@@ -1165,6 +1954,7 @@ def run_mutation_tests(config, progress, mutations_by_file):
             config=config,
             mutants_queue=mutants_queue,
             mutations_by_file=mutations_by_file,
+            number_of_workers=number_of_workers,
         )
     )
     queue_mutants_thread.start()
@@ -1172,7 +1962,9 @@ def run_mutation_tests(config, progress, mutations_by_file):
     results_queue = mp_ctx.Queue(maxsize=100)
     add_to_active_queues(results_queue)
 
-    def create_worker():
+    files = read_sources(mutations_by_file)
+
+    def create_worker(workspace):
         t = mp_ctx.Process(
             target=check_mutants,
             name='check_mutants',
@@ -1181,34 +1973,363 @@ def run_mutation_tests(config, progress, mutations_by_file):
                 mutants_queue=mutants_queue,
                 results_queue=results_queue,
                 cycle_process_after=CYCLE_PROCESS_AFTER,
+                config=config,
+                files=files,
+                workspace=workspace,
             )
         )
         t.start()
         return t
 
-    t = create_worker()
+    # With a single worker we mutate the files in place, otherwise every
+    # worker gets a workspace of its own so they don't race on the same files
+    if number_of_workers == 1:
+        workspaces = [None]
+    else:
+        workspaces = [create_workspace(tests_dirs=config.tests_dirs) for _ in range(number_of_workers)]
+
+    workers = [create_worker(workspace) for workspace in workspaces]
+    running_workers = len(workers)
+    killed_by = {}
+    tests = {}
+    statuses = MutantStatusWriter(config.hash_of_tests, config.test_file_hashes)
+
+    try:
+        while True:
+            try:
+                command, status, filename, mutation_id = results_queue.get(timeout=STATUS_FLUSH_INTERVAL)
+            except queue.Empty:
+                statuses.flush_if_due()
+                continue
+            if command == 'end':
+                running_workers -= 1
+                if not running_workers:
+                    for t in workers:
+                        t.join()
+                    break
+
+            elif command == 'cycle':
+                # status is the workspace of the retired worker here
+                workers.append(create_worker(status))
+
+            else:
+                handle_result(config, progress, killed_by, tests, statuses, command, status, filename, mutation_id)
+    finally:
+        statuses.flush()
+        for workspace in workspaces:
+            if workspace is not None:
+                rmtree(workspace, ignore_errors=True)
+
+
+class MutantQueueManager(BaseManager):
+    """Shares the mutants and results of a served run with remote workers over TCP"""
+
+
+MutantQueueManager.register('dispatcher')
+MutantQueueManager.register('results_queue')
+MutantQueueManager.register('setup')
+
+# seconds between the heartbeats of a remote worker, and without one after
+# which its mutants are handed out again
+WORKER_HEARTBEAT_INTERVAL = 5
+WORKER_TIMEOUT = 30
+
+
+class MutantDispatcher(object):
+    """Hands out the mutants of a served run to the remote workers
+
+    A mutant stays in flight from when a worker takes it until its status
+    arrives. The mutants of a worker that stopped sending heartbeats, because
+    it lost the connection or was stopped, and mutants that are in flight for
+    longer than testing a mutant can take, are handed out again.
+    """
+    def __init__(self, mutant_time_limit):
+        """
+        :param mutant_time_limit: seconds after which a mutant in flight is
+            handed out again, even if its worker is alive
+        """
+        self.mutant_time_limit = mutant_time_limit
+        self.lock = threading.Lock()
+        self.mutants = deque()
+        self.all_queued = False
+        # (worker, message, start) by (file_id, line_number, index)
+        self.in_flight = {}
+        self.last_seen = {}
+        self.started = time()
+
+    def put(self, message):
+        """Queue a mutant, or the end of the mutants, see :func:`queue_mutants`"""
+        with self.lock:
+            if message[0] == 'end':
+                self.all_queued = True
+            else:
+                self.mutants.append(message)
+
+    def take(self, worker):
+        """The next mutant for ``worker``, ``('wait', None)`` if there is none
+        yet, or ``('end', None)`` when all mutants are tested"""
+        with self.lock:
+            self.last_seen[worker] = time()
+            if self.mutants:
+                message = self.mutants.popleft()
+                file_id, line_number, index, _ = message[1]
+                self.in_flight[file_id, line_number, index] = (worker, message, time())
+                return message
+            if self.all_queued and not self.in_flight:
+                return 'end', None
+            # more mutants are coming, or a mutant in flight might be handed out again
+            return 'wait', None
+
+    def heartbeat(self, worker):
+        with self.lock:
+            self.last_seen[worker] = time()
+
+    def done(self, file_id, line_number, index):
+        """Take a mutant off the mutants in flight when its status arrives
+
+        :return: :obj:`False` if the mutant isn't in flight, because it was
+            handed out again and this is the status of the first try
+        """
+        with self.lock:
+            return self.in_flight.pop((file_id, line_number, index), None) is not None
+
+    def requeue_lost(self):
+        """Hand out the mutants of workers that are gone, and of mutants that take too long, again"""
+        now = time()
+        with self.lock:
+            for key, (worker, message, start) in list(self.in_flight.items()):
+                if now - self.last_seen[worker] > WORKER_TIMEOUT or now - start > self.mutant_time_limit:
+                    del self.in_flight[key]
+                    self.mutants.appendleft(message)
+
+    def finished(self):
+        with self.lock:
+            return self.all_queued and not self.mutants and not self.in_flight
+
+    def idle_time(self):
+        """Seconds since a worker was last heard from, or since the start without any worker"""
+        with self.lock:
+            return time() - max(self.last_seen.values(), default=self.started)
+
+
+def parse_address(address):
+    """Parse a ``host:port`` address
+
+    :type address: str
+    :rtype: tuple[str, int]
+    """
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError('Expected an address like host:port, got {!r}'.format(address))
+    return host, int(port)
+
+
+def serve_mutation_tests(config, progress, mutations_by_file, authkey, timeout=600):
+    """Like :func:`run_mutation_tests`, but the mutants are tested by remote
+    workers that connect to ``config.serve_address``
+
+    :type config: Config
+    :type progress: Progress
+    :type mutations_by_file: dict[str, list[RelativeMutationID]]
+    :type authkey: str
+    :param timeout: seconds without any worker after which the run is given up
+    :type timeout: float
+    """
+    from mutmut.cache import MutantStatusWriter
+
+    # a mutant can be checked for imports and tested against the killers, the
+    # selected tests and the whole suite, each with a timeout of ten baselines
+    dispatcher = MutantDispatcher(mutant_time_limit=config.baseline_time_elapsed * 40 + WORKER_TIMEOUT)
+    results_queue = queue.Queue(maxsize=100)
+
+    class Coordinator(MutantQueueManager):
+        pass
+
+    # what the workers need besides the mutants, fetched once per worker
+    setup = dict(config=config, files=read_sources(mutations_by_file))
+
+    Coordinator.register('dispatcher', callable=lambda: dispatcher, exposed=('take', 'heartbeat'))
+    Coordinator.register('results_queue', callable=lambda: results_queue)
+    Coordinator.register('setup', callable=lambda: setup)
+
+    # the server runs until the process ends, the workers stop when they get the end from the dispatcher
+    server = Coordinator(address=config.serve_address, authkey=authkey.encode()).get_server()
+    Thread(target=server.serve_forever, name='serve_workers', daemon=True).start()
+
+    host, port = server.address
+    print('Waiting for workers on {}:{}, start them in a checkout of the same code with:'.format(host, port))
+    print('    mutmut worker --connect {}:{}'.format(host, port))
+
+    queue_mutants_thread = Thread(
+        target=queue_mutants,
+        name='queue_mutants',
+        daemon=True,
+        kwargs=dict(
+            progress=progress,
+            config=config,
+            mutants_queue=dispatcher,
+            mutations_by_file=mutations_by_file,
+        )
+    )
+    queue_mutants_thread.start()
+
+    file_ids = {filename: file_id for file_id, filename in enumerate(mutations_by_file)}
+    killed_by = {}
+    tests = {}
+    statuses = MutantStatusWriter(config.hash_of_tests, config.test_file_hashes)
+    try:
+        while not dispatcher.finished():
+            dispatcher.requeue_lost()
+            if dispatcher.idle_time() > timeout:
+                raise TimeoutError('No worker for {} seconds, giving up on the mutants that are left'.format(timeout))
+            try:
+                command, status, filename, mutation_id = results_queue.get(timeout=1)
+            except queue.Empty:
+                statuses.flush_if_due()
+                continue
+            if command == 'status' and not dispatcher.done(file_ids[filename], mutation_id.line_number, mutation_id.index):
+                # the mutant was handed out again, another worker is testing it
+                killed_by.pop((filename, mutation_id), None)
+                tests.pop((filename, mutation_id), None)
+                continue
+            # end and cycle are handled by the remote worker itself
+            if command not in ('end', 'cycle'):
+                handle_result(config, progress, killed_by, tests, statuses, command, status, filename, mutation_id)
+    finally:
+        statuses.flush()
+
 
+def connect_to_coordinator(address, authkey, timeout=60):
+    """Connect to a ``mutmut serve`` coordinator, waiting up to ``timeout``
+    seconds for it to come up
+
+    :rtype: MutantQueueManager
+    """
+    deadline = time() + timeout
+    manager = MutantQueueManager(address=address, authkey=authkey.encode())
     while True:
-        command, status, filename, mutation_id = results_queue.get()
-        if command == 'end':
-            t.join()
-            break
+        try:
+            manager.connect()
+            return manager
+        except ConnectionRefusedError:
+            if time() > deadline:
+                raise
+            sleep(0.5)
+
+
+class RemoteMutantsQueue(object):
+    """The mutants queue of :func:`check_mutants` in a remote worker, takes
+    the mutants from the dispatcher of the coordinator"""
+    def __init__(self, dispatcher, worker):
+        self.dispatcher = dispatcher
+        self.worker = worker
+
+    def get(self):
+        while True:
+            message = self.dispatcher.take(self.worker)
+            if message[0] != 'wait':
+                return message
+            sleep(1)
 
-        elif command == 'cycle':
-            t = create_worker()
 
-        elif command == 'progress':
-            if not config.swallow_output:
-                print(status, end='', flush=True)
-            elif not config.no_progress:
-                progress.print()
+def send_heartbeats(dispatcher, worker):
+    """Tell the coordinator that ``worker`` is alive until the connection is gone"""
+    try:
+        while True:
+            dispatcher.heartbeat(worker)
+            sleep(WORKER_HEARTBEAT_INTERVAL)
+    except (EOFError, OSError):
+        pass
+
+
+def check_remote_mutants(address, authkey, results_queue, cycle_process_after, workspace=None):
+    """:func:`check_mutants` for mutants from a coordinator. The results go to
+    the local ``results_queue``, :func:`run_remote_worker` passes them on."""
+    coordinator = connect_to_coordinator(address, authkey)
+    dispatcher = coordinator.dispatcher()
+    worker = '{}:{}'.format(socket.gethostname(), os.getpid())
+    try:
+        Thread(target=send_heartbeats, args=(dispatcher, worker), name='heartbeats', daemon=True).start()
+        setup = coordinator.setup()._getvalue()
+        check_mutants(
+            RemoteMutantsQueue(dispatcher, worker),
+            results_queue,
+            cycle_process_after,
+            config=setup['config'],
+            files=setup['files'],
+            workspace=workspace,
+        )
+    except (EOFError, ConnectionError):
+        # the coordinator has all results and is gone
+        pass
 
-        else:
-            assert command == 'status'
 
-            progress.register(status)
+def run_remote_worker(address, authkey, jobs=1):
+    """Test mutants of the ``mutmut serve`` coordinator at ``address`` until
+    it runs out of mutants
+
+    :type address: tuple[str, int]
+    :type authkey: str
+    :type jobs: int
+    """
+    coordinator = connect_to_coordinator(address, authkey)
+    coordinator_results_queue = coordinator.results_queue()
+
+    number_of_workers = max(jobs, 1)
+    mp_ctx = multiprocessing.get_context('spawn')
+    results_queue = mp_ctx.Queue(maxsize=100)
+    add_to_active_queues(results_queue)
+
+    def create_worker(workspace):
+        t = mp_ctx.Process(
+            target=check_remote_mutants,
+            name='check_mutants',
+            daemon=True,
+            kwargs=dict(
+                address=address,
+                authkey=authkey,
+                results_queue=results_queue,
+                cycle_process_after=CYCLE_PROCESS_AFTER,
+                workspace=workspace,
+            )
+        )
+        t.start()
+        return t
+
+    if number_of_workers == 1:
+        workspaces = [None]
+    else:
+        tests_dirs = coordinator.setup()._getvalue()['config'].tests_dirs
+        workspaces = [create_workspace(tests_dirs=tests_dirs) for _ in range(number_of_workers)]
+
+    workers = [create_worker(workspace) for workspace in workspaces]
+    running_workers = len(workers)
 
-            update_mutant_status(file_to_mutate=filename, mutation_id=mutation_id, status=status, tests_hash=config.hash_of_tests)
+    try:
+        while True:
+            message = results_queue.get()
+            command, status = message[:2]
+            if command == 'end':
+                running_workers -= 1
+                if not running_workers:
+                    for t in workers:
+                        t.join()
+                    break
+
+            elif command == 'cycle':
+                # status is the workspace of the retired worker here
+                workers.append(create_worker(status))
+
+            else:
+                try:
+                    coordinator_results_queue.put(message)
+                except (EOFError, ConnectionError):
+                    # the coordinator has all results and is gone
+                    pass
+    finally:
+        for workspace in workspaces:
+            if workspace is not None:
+                rmtree(workspace, ignore_errors=True)
 
 
 def read_coverage_data():
@@ -1242,11 +2363,192 @@ def read_patch_data(patch_file_path):
     }
 
 
-def add_mutations_by_file(mutations_by_file, filename, dict_synonyms, config):
+def git(*args, cwd=None):
+    return subprocess.run(['git'] + list(args), cwd=cwd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode()
+
+
+def changed_lines_from_diff(diff):
+    """The changed lines of a ``git diff --unified=0``, for the files that still exist
+
+    :return: 1 based line numbers by the path in the diff
+    :rtype: dict[str, set[int]]
+    """
+    result = {}
+    lines = None
+    for line in diff.splitlines():
+        if line.startswith('+++ '):
+            path = line[4:]
+            lines = result.setdefault(path[2:], set()) if path.startswith('b/') else None
+        elif line.startswith('@@ ') and lines is not None:
+            match = re.match(r'@@ -\S+ \+(\d+)(?:,(\d+))? @@', line)
+            start, count = int(match.group(1)), int(match.group(2) or 1)
+            if count == 0:
+                # lines were only removed, the change is right after this line
+                lines.add(max(start, 1))
+            lines.update(range(start, start + count))
+    return {path: lines for path, lines in result.items() if lines}
+
+
+def widen_to_functions(source, lines):
+    """Add the lines of the innermost function around every line in ``lines``
+
+    :type lines: set[int]
+    :rtype: set[int]
+    """
+    functions = []
+
+    def find_functions(node):
+        if node.type in ('funcdef', 'async_funcdef'):
+            end_line, end_column = node.end_pos
+            # the function ends with the newline of its last line
+            functions.append((node.start_pos[0], end_line - 1 if end_column == 0 else end_line))
+        for child in getattr(node, 'children', []):
+            find_functions(child)
+
+    find_functions(parse(source))
+    result = set(lines)
+    for line in lines:
+        enclosing = [(start, end) for start, end in functions if start <= line <= end]
+        if enclosing:
+            start, end = min(enclosing, key=lambda x: x[1] - x[0])
+            result.update(range(start, end + 1))
+    return result
+
+
+def code_leaves(node):
+    """The leaves of ``node`` without line breaks"""
+    leaf = node.get_first_leaf()
+    last = node.get_last_leaf()
+    while True:
+        if leaf.type not in ('newline', 'endmarker'):
+            yield leaf
+        if leaf is last:
+            return
+        leaf = leaf.get_next_leaf()
+
+
+def code_of(node):
+    """The code of ``node`` without comments, whitespace and line breaks, so
+    reformatting doesn't change it"""
+    return ' '.join(x.value for x in code_leaves(node))
+
+
+def names_in(node):
+    if node.type == 'name':
+        return {node.value}
+    return set().union(*(names_in(x) for x in getattr(node, 'children', [])))
+
+
+def scope_fingerprints(module):
+    """The fingerprint of the scope of every line of ``module``: the innermost
+    function around the line, or else its statement in the module or class
+    body, together with every function, class and module level assignment
+    the scope uses by name, and everything those use in turn.
+
+    A mutant keeps its result as long as the fingerprint of its line doesn't
+    change, see :func:`mutmut.cache.update_mutant_scopes`.
+
+    :return: the fingerprint and the start of the scope by 0 based line number
+    :rtype: dict[int, tuple[str, tuple[int, int]]]
+    """
+    definitions = defaultdict(list)
+    scope_by_line = {}
+
+    def visit(node, is_statement):
+        if node.type in ('funcdef', 'classdef'):
+            definitions[node.name.value].append(node)
+        elif is_statement and node.type == 'simple_stmt':
+            for child in node.children:
+                if child.type == 'expr_stmt':
+                    for target in child.children[:-1:2]:
+                        for name in names_in(target):
+                            definitions[name].append(node)
+
+        # outer scopes come first, so the innermost one stays
+        if is_statement or node.type == 'funcdef':
+            end_line, end_column = node.end_pos
+            # a statement ends with the newline of its last line
+            for line in range(node.start_pos[0] - 1, end_line - 1 if end_column == 0 else end_line):
+                scope_by_line[line] = node
+
+        children = getattr(node, 'children', [])
+        if node.type == 'classdef':
+            suite = children[-1]
+            if suite.type == 'suite':
+                for child in suite.children:
+                    visit(child, is_statement=child.type not in ('newline', 'operator'))
+                children = children[:-1]
+        for child in children:
+            visit(child, is_statement=False)
+
+    for child in module.children:
+        visit(child, is_statement=True)
+
+    # the same definitions are dependencies of many scopes, their code and names are computed once
+    code_by_node = {}
+    names_by_node = {}
+
+    def cached_code_of(node):
+        if id(node) not in code_by_node:
+            code_by_node[id(node)] = code_of(node)
+        return code_by_node[id(node)]
+
+    def cached_names_in(node):
+        if id(node) not in names_by_node:
+            names_by_node[id(node)] = frozenset(names_in(node))
+        return names_by_node[id(node)]
+
+    fingerprint_by_scope = {}
+    result = defaultdict(lambda: ('', module.start_pos))
+    for line, scope in scope_by_line.items():
+        if id(scope) not in fingerprint_by_scope:
+            dependencies = {}
+            names = set(cached_names_in(scope))
+            while names:
+                for definition in definitions.get(names.pop(), []):
+                    if definition is not scope and id(definition) not in dependencies:
+                        dependencies[id(definition)] = cached_code_of(definition)
+                        names |= cached_names_in(definition)
+            m = hashlib.sha256()
+            m.update('\n'.join([cached_code_of(scope)] + sorted(dependencies.values())).encode())
+            fingerprint_by_scope[id(scope)] = m.hexdigest()
+        result[line] = fingerprint_by_scope[id(scope)], scope.get_first_leaf().start_pos
+    return result
+
+
+def read_git_changes(since):
+    """The lines changed since the git ref ``since``, widened to the functions
+    they're in. The working tree is compared with the merge base of ``since``
+    and ``HEAD``, so uncommitted changes count too.
+
+    :return: 1 based line numbers by filename relative to the current directory
+    :rtype: dict[str, set[int]]
+    :raises subprocess.CalledProcessError: if git fails, for example for an unknown ref
+    """
+    top_level = git('rev-parse', '--show-toplevel').strip()
+    merge_base = git('merge-base', since, 'HEAD').strip()
+    diff = git('diff', '--unified=0', '--no-color', '--no-ext-diff', '--diff-filter=d', merge_base, '--', '*.py', cwd=top_level)
+
+    untracked = git('ls-files', '--others', '--exclude-standard', '--full-name', '--', '*.py', cwd=top_level).splitlines()
+
+    result = {}
+    for path, lines in changed_lines_from_diff(diff).items():
+        filename = os.path.relpath(os.path.join(top_level, path))
+        with open(filename) as f:
+            source = f.read()
+        result[filename] = widen_to_functions(source, lines)
+    for path in untracked:
+        filename = os.path.relpath(os.path.join(top_level, path))
+        with open(filename) as f:
+            result[filename] = set(range(1, len(f.read().split('\n')) + 1))
+    return result
+
+
+def list_mutations_of_file(filename, dict_synonyms, config):
     """
-    :type mutations_by_file: dict[str, list[RelativeMutationID]]
     :type filename: str
     :type dict_synonyms: list[str]
+    :rtype: list[RelativeMutationID]
     """
     with open(filename) as f:
         source = f.read()
@@ -1258,12 +2560,134 @@ def add_mutations_by_file(mutations_by_file, filename, dict_synonyms, config):
     )
 
     try:
-        mutations_by_file[filename] = list_mutations(context)
-        from mutmut.cache import register_mutants
-        register_mutants(mutations_by_file)
+        mutation_ids = list_mutations(context)
     except Exception as e:
         raise RuntimeError('Failed while creating mutations for {}, for line "{}"'.format(context.filename, context.current_source_line)) from e
 
+    # the place of a mutant in its scope is the number of tokens before the
+    # mutated one, and the number of mutants of that token before it
+    token_offsets = [context.offset_of(x.start_pos) for x in code_leaves(context.module)]
+    scopes = scope_fingerprints(context.module)
+    mutants_by_token = defaultdict(int)
+    for mutation_id in mutation_ids:
+        fingerprint, scope_start = scopes[mutation_id.line_number]
+        token = bisect_left(token_offsets, mutation_id.edit[0]) - bisect_left(token_offsets, context.offset_of(scope_start))
+        mutation_id.scope_fingerprint = fingerprint
+        mutation_id.scope_position = '{}:{}'.format(token, mutants_by_token[scope_start, token])
+        mutants_by_token[scope_start, token] += 1
+    return mutation_ids
+
+
+def add_mutations_by_file(mutations_by_file, filename, dict_synonyms, config):
+    """
+    :type mutations_by_file: dict[str, list[RelativeMutationID]]
+    :type filename: str
+    :type dict_synonyms: list[str]
+    """
+    from mutmut.cache import register_mutants
+    mutations_by_file[filename] = list_mutations_of_file(filename, dict_synonyms, config)
+    register_mutants({filename: mutations_by_file[filename]})
+
+
+def bytecode_fingerprint(code):
+    """Everything about ``code`` that changes what it does, but not its line
+    numbers and columns or constants left over from code the compiler removed
+
+    :type code: types.CodeType
+    """
+    def constant(value):
+        if isinstance(value, CodeType):
+            return bytecode_fingerprint(value)
+        if isinstance(value, (tuple, frozenset)):
+            return type(value)(constant(x) for x in value)
+        # 1, 1.0 and True are equal, but they aren't equivalent
+        return type(value).__name__, repr(value)
+
+    return (
+        code.co_name,
+        tuple(
+            (x.opcode, constant(x.argval) if x.opcode in dis.hasconst else x.arg)
+            for x in dis.get_instructions(code)
+        ),
+        constant(code.co_consts[0]) if code.co_consts else None,  # the docstring
+        code.co_names,
+        code.co_varnames,
+        code.co_freevars,
+        code.co_cellvars,
+        code.co_flags,
+        code.co_argcount,
+        getattr(code, 'co_posonlyargcount', 0),
+        code.co_kwonlyargcount,
+        getattr(code, 'co_exceptiontable', None),
+    )
+
+
+def find_equivalent_mutants(filename, mutation_ids):
+    """The mutants that compile to the same bytecode as the original source
+    or as an earlier mutant, testing them can't tell anything new
+
+    :type mutation_ids: list[RelativeMutationID]
+    :rtype: list[RelativeMutationID]
+    """
+    with open(filename) as f:
+        source = Context(source=f.read()).source
+    try:
+        seen = {bytecode_fingerprint(compile(source, filename, 'exec', dont_inherit=True))}
+    except (SyntaxError, ValueError):
+        return []
+
+    result = []
+    for mutation_id in mutation_ids:
+        try:
+            code = compile(apply_edit(source, mutation_id.edit), filename, 'exec', dont_inherit=True)
+        except (SyntaxError, ValueError):
+            continue
+        fingerprint = bytecode_fingerprint(code)
+        if fingerprint in seen:
+            result.append(mutation_id)
+        else:
+            seen.add(fingerprint)
+    return result
+
+
+_discovery_arguments = None
+
+
+def _init_discovery_process(dict_synonyms, config):
+    global _discovery_arguments
+    _discovery_arguments = dict_synonyms, config
+
+
+def list_and_compare_mutations_of_file(filename, dict_synonyms, config):
+    mutation_ids = list_mutations_of_file(filename, dict_synonyms, config)
+    if config is None or not config.detect_equivalent:
+        return filename, mutation_ids, []
+    return filename, mutation_ids, find_equivalent_mutants(filename, mutation_ids)
+
+
+def _list_mutations_in_discovery_process(filename):
+    dict_synonyms, config = _discovery_arguments
+    return list_and_compare_mutations_of_file(filename, dict_synonyms, config)
+
+
+def list_mutations_by_file(filenames, dict_synonyms, config, jobs=1):
+    """List the mutations of ``filenames``, one file per task in a pool of
+    ``jobs`` processes. The config is sent once per process.
+
+    :type filenames: list[str]
+    :return: generator of ``(filename, mutation ids, equivalent mutation ids)``
+        in the order of ``filenames``, see :func:`find_equivalent_mutants`
+    :rtype: Generator[tuple[str, list[RelativeMutationID], list[RelativeMutationID]], None, None]
+    """
+    if jobs <= 1 or len(filenames) <= 1:
+        for filename in filenames:
+            yield list_and_compare_mutations_of_file(filename, dict_synonyms, config)
+        return
+
+    mp_ctx = multiprocessing.get_context('spawn')
+    with mp_ctx.Pool(min(jobs, len(filenames)), initializer=_init_discovery_process, initargs=(dict_synonyms, config)) as pool:
+        yield from pool.imap(_list_mutations_in_discovery_process, filenames)
+
 
 def python_source_files(path, tests_dirs, paths_to_exclude=None):
     """Attempt to guess where the python source files to mutate are and yield
@@ -1297,6 +2721,95 @@ def python_source_files(path, tests_dirs, paths_to_exclude=None):
         yield path
 
 
+def parse_sample_size(sample, total):
+    """The number of mutants to test for ``--sample``
+
+    :param sample: a number of mutants like ``500`` or a percentage like ``10%``
+    :type sample: str
+    :type total: int
+    :rtype: int
+    """
+    try:
+        if sample.endswith('%'):
+            percentage = float(sample[:-1])
+            if not 0 < percentage <= 100:
+                raise ValueError()
+            return min(total, math.ceil(total * percentage / 100))
+        size = int(sample)
+        if size <= 0:
+            raise ValueError()
+        return min(total, size)
+    except ValueError:
+        raise ValueError('--sample takes a positive number of mutants or a percentage like 10%, not {}'.format(sample)) from None
+
+
+def sample_mutations(mutations_by_file, size, seed):
+    """A random sample of ``size`` mutants, stratified by file and by mutation
+    type. Every group gets its proportional share of the sample, so the share
+    of killed mutants in the sample estimates the one of all mutants.
+
+    :type mutations_by_file: dict[str, list[RelativeMutationID]]
+    :type size: int
+    :type seed: int
+    :rtype: dict[str, list[RelativeMutationID]]
+    """
+    strata = {}
+    for filename, mutation_ids in mutations_by_file.items():
+        for mutation_id in mutation_ids:
+            strata.setdefault((filename, mutation_id.mutation_type or ''), []).append(mutation_id)
+    total = sum(len(x) for x in strata.values())
+
+    # largest remainder allocation: the integer part of every share first, then
+    # one more mutant for the groups with the largest fractions left
+    shares = {key: len(mutation_ids) * size / total for key, mutation_ids in strata.items()}
+    allocation = {key: int(share) for key, share in shares.items()}
+    by_remainder = sorted(strata, key=lambda key: (-(shares[key] - allocation[key]), key))
+    for key in by_remainder[:size - sum(allocation.values())]:
+        allocation[key] += 1
+
+    rng = random.Random(seed)
+    selected = set()
+    for key in sorted(strata):
+        for mutation_id in rng.sample(strata[key], allocation[key]):
+            selected.add((key[0], mutation_id))
+
+    result = {}
+    for filename, mutation_ids in mutations_by_file.items():
+        sampled = [x for x in mutation_ids if (filename, x) in selected]
+        if sampled:
+            result[filename] = sampled
+    return result
+
+
+def mutation_score_interval(killed, tested, z=1.96):
+    """The Wilson score interval of the share of killed mutants, 95% confidence by default
+
+    :rtype: tuple[float, float]
+    """
+    if not tested:
+        return 0.0, 1.0
+    p = killed / tested
+    denominator = 1 + z ** 2 / tested
+    center = (p + z ** 2 / (2 * tested)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / tested + z ** 2 / (4 * tested ** 2)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def print_sample_score(progress, population):
+    """Print the mutation score of a sampled run with its confidence interval
+
+    :type progress: Progress
+    :param population: the number of mutants the sample was taken from
+    """
+    killed = progress.killed_mutants + progress.suspicious_mutants
+    tested = killed + progress.surviving_mutants + progress.surviving_mutants_timeout
+    low, high = mutation_score_interval(killed, tested)
+    score = killed / tested if tested else 0.0
+    print()
+    print('Mutation score {:.1%} (95% confidence interval {:.1%} to {:.1%}) from a sample of {} of {} mutants'.format(
+        score, low, high, progress.total, population))
+
+
 def compute_exit_code(progress, exception=None, ci=False):
     """Compute an exit code for mutmut mutation testing
 
@@ -1338,6 +2851,12 @@ def compute_exit_code(progress, exception=None, ci=False):
 
 
 hammett_prefix = 'python -m hammett '
+pytest_prefix = 'python -m pytest '
+# failing tests and collection errors, a mutant that breaks the import of a
+# test module is killed
+PYTEST_FAILED = (1, 2)
+# also the exit code when a selected test doesn't exist (anymore)
+PYTEST_USAGE_ERROR = 4
 spinner = itertools.cycle('⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏')
 print_status = status_printer()
 
@@ -1350,5 +2869,5 @@ def add_to_active_queues(queue):
 
 
 def close_active_queues():
-    for queue in _active_queues:
-        queue.close()
+    for active_queue in _active_queues:
+        active_queue.close()
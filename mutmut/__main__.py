@@ -2,6 +2,8 @@
 # -*- coding: utf-8 -*-
 
 import os
+import secrets
+import subprocess
 import sys
 import traceback
 from io import (
@@ -29,13 +31,25 @@ from mutmut import (
     check_coverage_data_filepaths,
     popen_streaming_output,
     run_mutation_tests,
+    serve_mutation_tests,
+    run_remote_worker,
+    parse_address,
     read_coverage_data,
     read_patch_data,
-    add_mutations_by_file,
+    read_git_changes,
+    parse_sample_size,
+    sample_mutations,
+    print_sample_score,
+    list_mutations_by_file,
     python_source_files,
     compute_exit_code,
     print_status,
     close_active_queues,
+    format_test_command,
+    durations_from_output,
+    pytest_prefix,
+    pytest_durations_arguments,
+    TESTS_PLACEHOLDER,
 )
 from mutmut.cache import (
     create_html_report,
@@ -43,8 +57,11 @@ from mutmut.cache import (
 )
 from mutmut.cache import print_result_cache, print_result_ids_cache, \
     hash_of_tests, \
+    hashes_of_test_files, \
     filename_and_mutation_id_from_pk, cached_test_time, set_cached_test_time, \
-    update_line_numbers, print_result_cache_junitxml, get_unified_diff
+    cached_test_durations, set_cached_test_durations, \
+    update_line_numbers, register_mutants, scoped_results, update_mutant_scopes, print_result_cache_junitxml, get_unified_diff, \
+    mutations_cache_key, cached_mutations_by_file, set_cached_mutations, set_equivalent_mutants
 
 
 def do_apply(mutation_pk, dict_synonyms, backup):
@@ -79,6 +96,60 @@ null_out = open(os.devnull, 'w')
 
 DEFAULT_RUNNER = 'python -m pytest -x --assert=plain'
 
+# where mutmut serve writes the shared secret it generates
+AUTHKEY_FILENAME = '.mutmut-authkey'
+
+
+def run_options(f):
+    """The options of the ``run`` command, shared with the ``serve`` command"""
+    options = [
+        click.option('--paths-to-mutate', type=click.STRING),
+        click.option('--disable-mutation-types', type=click.STRING, help='Skip the given types of mutations.'),
+        click.option('--enable-mutation-types', type=click.STRING, help='Only perform given types of mutations.'),
+        click.option('--paths-to-exclude', type=click.STRING),
+        click.option('--runner'),
+        click.option('--use-coverage', is_flag=True, default=False),
+        click.option('--use-patch-file', help='Only mutate lines added/changed in the given patch file'),
+        click.option('--since', help='Only mutate the functions changed since the given git ref, for example origin/main'),
+        click.option('--sample', help='Only test a random sample of the mutants, stratified by file and mutation type. A number of mutants like 500 or a percentage like 10%.'),
+        click.option('--sample-seed', type=int, help='Seed of the random sample, the same seed picks the same mutants.'),
+        click.option('--use-schemata', is_flag=True, default=False, help='Write all mutants of a file into one instrumented source and select the mutant through the MUTANT_UNDER_TEST environment variable.'),
+        click.option('--use-fork-server', is_flag=True, default=False, help='Import the test suite once and fork a child for every mutant (pytest on posix systems only).'),
+        click.option('--use-import-hook', is_flag=True, default=False, help='Serve the mutated module from memory through an import hook instead of writing it to disk.'),
+        click.option('--detect-equivalent', is_flag=True, default=False, help='Compile every mutant and skip the ones with the same bytecode as the original code or as another mutant.'),
+        click.option('--check-import', is_flag=True, default=False, help='Import every mutated module in a fresh interpreter first, mutants that fail to import are killed without running the tests.'),
+        click.option('--rerun-all', is_flag=True, default=False, help='If you modified the test_command in the pre_mutation hook, '
+                                                                      'the default test_command (specified by the "runner" option) '
+                                                                      'will be executed if the mutant survives with your modified test_command.'),
+        click.option('--tests-dir'),
+        click.option('-m', '--test-time-multiplier', default=2.0, type=float),
+        click.option('-b', '--test-time-base', default=0.0, type=float),
+        click.option('-s', '--swallow-output', help='turn off output capture', is_flag=True),
+        click.option('--dict-synonyms'),
+        click.option('--pre-mutation'),
+        click.option('--post-mutation'),
+        click.option('--simple-output', is_flag=True, default=False, help="Swap emojis in mutmut output to plain text alternatives."),
+        click.option('--no-progress', is_flag=True, default=False, help="Disable real-time progress indicator"),
+        click.option('--CI', is_flag=True, default=False, help="Returns an exit code of 0 for all successful runs and an exit code of 1 for fatal errors."),
+        click.option('-j', '--jobs', type=int, help="Number of mutants to test in parallel, each in its own copy of the project tree."),
+        config_from_file(
+            dict_synonyms='',
+            paths_to_exclude='',
+            runner=DEFAULT_RUNNER,
+            tests_dir='tests/:test/',
+            pre_mutation=None,
+            post_mutation=None,
+            use_patch_file=None,
+            since=None,
+            sample=None,
+            sample_seed=0,
+            jobs=1,
+        ),
+    ]
+    for option in reversed(options):
+        f = option(f)
+    return f
+
 
 @click.group(context_settings=dict(help_option_names=['-h', '--help']))
 def climain():
@@ -97,39 +168,12 @@ def version():
 
 @climain.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.argument('argument', nargs=1, required=False)
-@click.option('--paths-to-mutate', type=click.STRING)
-@click.option('--disable-mutation-types', type=click.STRING, help='Skip the given types of mutations.')
-@click.option('--enable-mutation-types', type=click.STRING, help='Only perform given types of mutations.')
-@click.option('--paths-to-exclude', type=click.STRING)
-@click.option('--runner')
-@click.option('--use-coverage', is_flag=True, default=False)
-@click.option('--use-patch-file', help='Only mutate lines added/changed in the given patch file')
-@click.option('--rerun-all', is_flag=True, default=False, help='If you modified the test_command in the pre_mutation hook, '
-                                                               'the default test_command (specified by the "runner" option) '
-                                                               'will be executed if the mutant survives with your modified test_command.')
-@click.option('--tests-dir')
-@click.option('-m', '--test-time-multiplier', default=2.0, type=float)
-@click.option('-b', '--test-time-base', default=0.0, type=float)
-@click.option('-s', '--swallow-output', help='turn off output capture', is_flag=True)
-@click.option('--dict-synonyms')
-@click.option('--pre-mutation')
-@click.option('--post-mutation')
-@click.option('--simple-output', is_flag=True, default=False, help="Swap emojis in mutmut output to plain text alternatives.")
-@click.option('--no-progress', is_flag=True, default=False, help="Disable real-time progress indicator")
-@click.option('--CI', is_flag=True, default=False, help="Returns an exit code of 0 for all successful runs and an exit code of 1 for fatal errors.")
-@config_from_file(
-    dict_synonyms='',
-    paths_to_exclude='',
-    runner=DEFAULT_RUNNER,
-    tests_dir='tests/:test/',
-    pre_mutation=None,
-    post_mutation=None,
-    use_patch_file=None,
-)
+@run_options
 def run(argument, paths_to_mutate, disable_mutation_types, enable_mutation_types, runner,
         tests_dir, test_time_multiplier, test_time_base, swallow_output, use_coverage,
         dict_synonyms, pre_mutation, post_mutation, use_patch_file, paths_to_exclude,
-        simple_output, no_progress, ci, rerun_all):
+        simple_output, no_progress, ci, rerun_all, jobs, use_schemata, use_fork_server,
+        use_import_hook, detect_equivalent, check_import, since, sample, sample_seed):
     """
     Runs mutmut. You probably want to start with just trying this. If you supply a mutation ID mutmut will check just this mutant.
     """
@@ -141,7 +185,57 @@ def run(argument, paths_to_mutate, disable_mutation_types, enable_mutation_types
     sys.exit(do_run(argument, paths_to_mutate, disable_mutation_types, enable_mutation_types, runner,
                     tests_dir, test_time_multiplier, test_time_base, swallow_output, use_coverage,
                     dict_synonyms, pre_mutation, post_mutation, use_patch_file, paths_to_exclude,
-                    simple_output, no_progress, ci, rerun_all))
+                    simple_output, no_progress, ci, rerun_all, int(jobs), use_schemata,
+                    use_fork_server, use_import_hook, detect_equivalent=detect_equivalent,
+                    check_import=check_import, since=since, sample=sample, sample_seed=int(sample_seed)))
+
+
+@climain.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.argument('argument', nargs=1, required=False)
+@click.option('--bind', default='127.0.0.1:7337', show_default=True, help='Address to listen on for workers, as host:port.')
+@click.option('--authkey', envvar='MUTMUT_AUTHKEY', help='Shared secret of the coordinator and the workers, better given in the MUTMUT_AUTHKEY environment variable.')
+@click.option('--authkey-file', type=click.Path(exists=True, dir_okay=False), help='File with the shared secret. Without this or --authkey a random one is written to {}.'.format(AUTHKEY_FILENAME))
+@click.option('--timeout', default=600.0, show_default=True, help='Give up when no worker was heard from for this many seconds.')
+@run_options
+def serve(argument, bind, authkey, authkey_file, timeout, paths_to_mutate, disable_mutation_types, enable_mutation_types, runner,
+          tests_dir, test_time_multiplier, test_time_base, swallow_output, use_coverage,
+          dict_synonyms, pre_mutation, post_mutation, use_patch_file, paths_to_exclude,
+          simple_output, no_progress, ci, rerun_all, jobs, use_schemata, use_fork_server,
+          use_import_hook, detect_equivalent, check_import, since, sample, sample_seed):
+    """
+    Like run, but the mutants are tested by workers started with "mutmut worker --connect host:port", possibly on other machines. Every worker needs its own checkout of the same code.
+    """
+    if test_time_base is None:  # click sets the default=0.0 to None
+        test_time_base = 0.0
+    if test_time_multiplier is None:  # click sets the default=0.0 to None
+        test_time_multiplier = 0.0
+
+    sys.exit(do_run(argument, paths_to_mutate, disable_mutation_types, enable_mutation_types, runner,
+                    tests_dir, test_time_multiplier, test_time_base, swallow_output, use_coverage,
+                    dict_synonyms, pre_mutation, post_mutation, use_patch_file, paths_to_exclude,
+                    simple_output, no_progress, ci, rerun_all, int(jobs), use_schemata,
+                    use_fork_server, use_import_hook, detect_equivalent=detect_equivalent,
+                    check_import=check_import, since=since, sample=sample, sample_seed=int(sample_seed),
+                    serve_address=parse_address(bind), authkey=serve_authkey(authkey, authkey_file),
+                    serve_timeout=timeout))
+
+
+@climain.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option('--connect', required=True, help='Address of the "mutmut serve" coordinator, as host:port.')
+@click.option('--authkey', envvar='MUTMUT_AUTHKEY', help='The shared secret of "mutmut serve", better given in the MUTMUT_AUTHKEY environment variable.')
+@click.option('--authkey-file', type=click.Path(exists=True, dir_okay=False), help='File with the shared secret of "mutmut serve".')
+@click.option('-j', '--jobs', type=int, default=1, help="Number of mutants to test in parallel, each in its own copy of the project tree.")
+def worker(connect, authkey, authkey_file, jobs):
+    """
+    Test mutants handed out by a "mutmut serve" coordinator against the checkout in the current directory.
+    """
+    authkey = read_authkey(authkey, authkey_file)
+    if authkey is None:
+        raise click.UsageError('Give the shared secret of "mutmut serve" with MUTMUT_AUTHKEY, --authkey or --authkey-file')
+    try:
+        run_remote_worker(parse_address(connect), authkey, jobs=jobs)
+    finally:
+        close_active_queues()
 
 
 @climain.command(context_settings=dict(help_option_names=['-h', '--help']))
@@ -158,7 +252,7 @@ def results():
 def result_ids(status):
     """
     Print the IDs of the specified mutant classes (separated by spaces).\n
-    result-ids survived (or any other of: killed,timeout,suspicious,skipped,untested)\n
+    result-ids survived (or any other of: killed,timeout,suspicious,skipped,equivalent,untested)\n
     """
     if not status or status not in MUTANT_STATUSES:
         raise click.BadArgumentUsage(f'The result-ids command needs a status class of mutants '
@@ -236,10 +330,36 @@ def html(dict_synonyms):
     sys.exit(0)
 
 
+def read_authkey(authkey, authkey_file):
+    """The shared secret of a served run, :obj:`None` if none is given"""
+    if authkey:
+        return authkey
+    if authkey_file:
+        with open(authkey_file) as f:
+            return f.read().strip()
+    return None
+
+
+def serve_authkey(authkey, authkey_file):
+    """The shared secret of ``mutmut serve``. A random one is written to
+    :data:`AUTHKEY_FILENAME` if none is given, it's never printed."""
+    authkey = read_authkey(authkey, authkey_file)
+    if authkey is None:
+        authkey = secrets.token_hex(16)
+        fd = os.open(AUTHKEY_FILENAME, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(authkey + '\n')
+        print('The shared secret of the workers is in {}, give it to them with --authkey-file or MUTMUT_AUTHKEY'.format(AUTHKEY_FILENAME))
+    return authkey
+
+
 def do_run(argument, paths_to_mutate, disable_mutation_types,
            enable_mutation_types, runner, tests_dir, test_time_multiplier, test_time_base,
            swallow_output, use_coverage, dict_synonyms, pre_mutation, post_mutation,
-           use_patch_file, paths_to_exclude, simple_output, no_progress, ci, rerun_all):
+           use_patch_file, paths_to_exclude, simple_output, no_progress, ci, rerun_all, jobs=1,
+           use_schemata=False, use_fork_server=False, use_import_hook=False, serve_address=None,
+           authkey=None, detect_equivalent=False, check_import=False, since=None, sample=None,
+           sample_seed=0, serve_timeout=600.0):
     """return exit code, after performing an mutation test run.
 
     :return: the exit code from executing the mutation tests
@@ -248,8 +368,15 @@ def do_run(argument, paths_to_mutate, disable_mutation_types,
     if use_coverage and use_patch_file:
         raise click.BadArgumentUsage("You can't combine --use-coverage and --use-patch")
 
+    if since and (use_coverage or use_patch_file):
+        raise click.BadArgumentUsage("You can't combine --since with --use-coverage or --use-patch")
+
     if disable_mutation_types and enable_mutation_types:
         raise click.BadArgumentUsage("You can't combine --disable-mutation-types and --enable-mutation-types")
+
+    if use_schemata and use_import_hook:
+        raise click.BadArgumentUsage("You can't combine --use-schemata and --use-import-hook")
+
     if enable_mutation_types:
         mutation_types_to_apply = set(mtype.strip() for mtype in enable_mutation_types.split(","))
         invalid_types = [mtype for mtype in mutation_types_to_apply if mtype not in mutations_by_type]
@@ -309,6 +436,7 @@ def do_run(argument, paths_to_mutate, disable_mutation_types,
         "suspicious": "🤔",
         "survived": "🙁",
         "skipped": "🔇",
+        "equivalent": "🟰",
     }
     if simple_output:
         output_legend = {key: key.upper() for (key, value) in output_legend.items()}
@@ -331,6 +459,7 @@ Legend for output:
 {suspicious} Suspicious.       Tests took a long time, but not long enough to be fatal.
 {survived} Survived.         This means your tests need to be expanded.
 {skipped} Skipped.          Skipped.
+{equivalent} Equivalent.       Same bytecode as the original code or another mutant, not tested.
 """.format(**output_legend))
     if runner is DEFAULT_RUNNER:
         try:
@@ -355,14 +484,18 @@ Legend for output:
     # if we're running in a mode with externally whitelisted lines
     covered_lines_by_filename = None
     coverage_data = None
-    if use_coverage or use_patch_file:
+    if use_coverage or use_patch_file or since:
         covered_lines_by_filename = {}
         if use_coverage:
             coverage_data = read_coverage_data()
             check_coverage_data_filepaths(coverage_data)
-        else:
-            assert use_patch_file
+        elif use_patch_file:
             covered_lines_by_filename = read_patch_data(use_patch_file)
+        else:
+            try:
+                covered_lines_by_filename = read_git_changes(since)
+            except subprocess.CalledProcessError as e:
+                raise click.BadArgumentUsage('Could not find the changes since {}: {}'.format(since, e.stderr.decode().strip()))
 
     mutations_by_file = {}
 
@@ -378,10 +511,12 @@ Legend for output:
         covered_lines_by_filename=covered_lines_by_filename,
         coverage_data=coverage_data,
         baseline_time_elapsed=baseline_time_elapsed,
+        test_durations=cached_test_durations(),
         dict_synonyms=dict_synonyms,
         using_testmon=using_testmon,
         tests_dirs=tests_dirs,
         hash_of_tests=current_hash_of_tests,
+        test_file_hashes=hashes_of_test_files(tests_dirs),
         test_time_multiplier=test_time_multiplier,
         test_time_base=test_time_base,
         pre_mutation=pre_mutation,
@@ -390,23 +525,43 @@ Legend for output:
         mutation_types_to_apply=mutation_types_to_apply,
         no_progress=no_progress,
         ci=ci,
-        rerun_all=rerun_all
+        rerun_all=rerun_all,
+        jobs=jobs,
+        use_schemata=use_schemata,
+        use_fork_server=use_fork_server,
+        use_import_hook=use_import_hook,
+        serve_address=serve_address,
+        detect_equivalent=detect_equivalent,
+        check_import=check_import,
     )
 
     parse_run_argument(argument, config, dict_synonyms, mutations_by_file, paths_to_exclude, paths_to_mutate, tests_dirs)
 
     config.total = sum(len(mutations) for mutations in mutations_by_file.values())
+    population = config.total
+    if sample:
+        try:
+            sample_size = parse_sample_size(sample, population)
+        except ValueError as e:
+            raise click.BadArgumentUsage(str(e))
+        mutations_by_file = sample_mutations(mutations_by_file, sample_size, sample_seed)
+        config.total = sample_size
 
     print()
     print('2. Checking mutants')
     progress = Progress(total=config.total, output_legend=output_legend, no_progress=no_progress)
 
     try:
-        run_mutation_tests(config=config, progress=progress, mutations_by_file=mutations_by_file)
+        if serve_address is not None:
+            serve_mutation_tests(config=config, progress=progress, mutations_by_file=mutations_by_file, authkey=authkey, timeout=serve_timeout)
+        else:
+            run_mutation_tests(config=config, progress=progress, mutations_by_file=mutations_by_file)
     except Exception as e:
         traceback.print_exc()
         return compute_exit_code(progress, e)
     else:
+        if sample:
+            print_sample_score(progress, population)
         return compute_exit_code(progress, ci=ci)
     finally:
         print()  # make sure we end the output with a newline
@@ -416,12 +571,13 @@ Legend for output:
 
 def parse_run_argument(argument, config, dict_synonyms, mutations_by_file, paths_to_exclude, paths_to_mutate, tests_dirs):
     if argument is None:
-        for path in paths_to_mutate:
-            for filename in python_source_files(path, tests_dirs, paths_to_exclude):
-                if filename.startswith('test_') or filename.endswith('__tests.py'):
-                    continue
-                update_line_numbers(filename)
-                add_mutations_by_file(mutations_by_file, filename, dict_synonyms, config)
+        filenames = [
+            filename
+            for path in paths_to_mutate
+            for filename in python_source_files(path, tests_dirs, paths_to_exclude)
+            if not (filename.startswith('test_') or filename.endswith('__tests.py'))
+        ]
+        add_mutations_of_files(mutations_by_file, filenames, dict_synonyms, config)
     else:
         try:
             int(argument)
@@ -429,8 +585,7 @@ def parse_run_argument(argument, config, dict_synonyms, mutations_by_file, paths
             filename = argument
             if not os.path.exists(filename):
                 raise click.BadArgumentUsage('The run command takes either an integer that is the mutation id or a path to a file to mutate')
-            update_line_numbers(filename)
-            add_mutations_by_file(mutations_by_file, filename, dict_synonyms, config)
+            add_mutations_of_files(mutations_by_file, [filename], dict_synonyms, config)
             return
 
         filename, mutation_id = filename_and_mutation_id_from_pk(int(argument))
@@ -438,6 +593,27 @@ def parse_run_argument(argument, config, dict_synonyms, mutations_by_file, paths
         mutations_by_file[filename] = [mutation_id]
 
 
+def add_mutations_of_files(mutations_by_file, filenames, dict_synonyms, config):
+    """List the mutations of ``filenames`` into ``mutations_by_file``. Files that
+    haven't changed since the last run are read from the cache, the others
+    are parsed in parallel and the cache is only written to from this process.
+    """
+    keys_by_filename = {filename: mutations_cache_key(filename, dict_synonyms, config) for filename in filenames}
+    found = cached_mutations_by_file(keys_by_filename)
+    to_list = [filename for filename in filenames if filename not in found]
+    for filename, mutation_ids, equivalent_mutation_ids in list_mutations_by_file(to_list, dict_synonyms, config, jobs=config.jobs):
+        previous_results = scoped_results(filename)
+        update_line_numbers(filename)
+        register_mutants({filename: mutation_ids})
+        update_mutant_scopes(filename, mutation_ids, previous_results)
+        set_equivalent_mutants(filename, equivalent_mutation_ids)
+        set_cached_mutations(filename, keys_by_filename[filename], mutation_ids)
+        found[filename] = mutation_ids
+
+    for filename in filenames:
+        mutations_by_file[filename] = found[filename]
+
+
 def time_test_suite(swallow_output, test_command, using_testmon, current_hash_of_tests, no_progress):
     """Execute a test suite specified by ``test_command`` and record
     the time it took to execute the test suite as a floating point number
@@ -472,6 +648,12 @@ def time_test_suite(swallow_output, test_command, using_testmon, current_hash_of
             print_status('Running...')
         output.append(line)
 
+    # the durations of the single tests give tighter timeouts when only some tests run for a mutant
+    record_durations = TESTS_PLACEHOLDER in test_command and test_command.startswith(pytest_prefix)
+    test_command = format_test_command(test_command, [])
+    if record_durations:
+        test_command += pytest_durations_arguments()
+
     returncode = popen_streaming_output(test_command, feedback)
 
     if returncode == 0 or (using_testmon and returncode == 5):
@@ -482,6 +664,7 @@ def time_test_suite(swallow_output, test_command, using_testmon, current_hash_of
     print('Done')
 
     set_cached_test_time(baseline_time_elapsed, current_hash_of_tests)
+    set_cached_test_durations(durations_from_output(output) if record_durations else None)
 
     return baseline_time_elapsed
 
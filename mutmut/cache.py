@@ -1,30 +1,53 @@
 # -*- coding: utf-8 -*-
 
 import hashlib
+import json
 import os
-from collections import defaultdict
+from collections import Counter, defaultdict
 from difflib import SequenceMatcher, unified_diff
 from functools import wraps
 from io import open
 from itertools import groupby, zip_longest
 from os.path import join, dirname
+from time import monotonic
 from typing import Tuple
 
 
 from junit_xml import TestSuite, TestCase
-from pony.orm import Database, Required, db_session, Set, Optional, select, \
-    PrimaryKey, RowNotFound, ERDiagramError, OperationalError
+from pony.orm import Database, Required, db_session, Set, Optional, select, LongStr, \
+    PrimaryKey, OperationalError, composite_index
 
 from mutmut import MUTANT_STATUSES, BAD_TIMEOUT, OK_SUSPICIOUS, BAD_SURVIVED, UNTESTED, \
-    OK_KILLED, RelativeMutationID, Context, mutate
+    OK_KILLED, OK_EQUIVALENT, KILLED_BY_COMPILE_ERROR, KILLED_BY_IMPORT_ERROR, RelativeMutationID, Context, mutate, list_mutations, mutmut_config, __version__, \
+    coverage_filename
 
 db = Database()
 
-current_db_version = 4
+current_db_version = 8
+
+# the statements that upgrade a cache from the version before, see migrate_db
+migrations = {
+    5: [
+        'ALTER TABLE "Mutant" ADD COLUMN "killed_by" TEXT NOT NULL DEFAULT \'\'',
+    ],
+    6: [
+        'ALTER TABLE "SourceFile" ADD COLUMN "mutations_key" TEXT NOT NULL DEFAULT \'\'',
+        'ALTER TABLE "SourceFile" ADD COLUMN "mutations" TEXT NOT NULL DEFAULT \'\'',
+    ],
+    # the indexes of version 7 are created by generate_mapping
+    7: [],
+    8: [
+        'ALTER TABLE "Mutant" ADD COLUMN "scope_fingerprint" TEXT NOT NULL DEFAULT \'\'',
+        'ALTER TABLE "Mutant" ADD COLUMN "scope_position" TEXT NOT NULL DEFAULT \'\'',
+    ],
+}
 
 
 NO_TESTS_FOUND = 'NO TESTS FOUND'
 
+# the format of SourceFile.mutations, part of the mutations_cache_key
+mutations_format = 2
+
 
 class MiscData(db.Entity):
     key = PrimaryKey(str, auto=True)
@@ -32,9 +55,11 @@ class MiscData(db.Entity):
 
 
 class SourceFile(db.Entity):
-    filename = Required(str, autostrip=False)
+    filename = Required(str, autostrip=False, index=True)
     hash = Optional(str)
     lines = Set('Line')
+    mutations_key = Optional(str)  # see mutations_cache_key
+    mutations = Optional(LongStr, autostrip=False)  # JSON of the mutation ids listed for mutations_key
 
 
 class Line(db.Entity):
@@ -42,13 +67,60 @@ class Line(db.Entity):
     line = Optional(str, autostrip=False)
     line_number = Required(int)
     mutants = Set('Mutant')
+    composite_index(sourcefile, line, line_number)
 
 
 class Mutant(db.Entity):
     line = Required(Line)
     index = Required(int)
     tested_against_hash = Optional(str, autostrip=False)
-    status = Required(str, autostrip=False)  # really an enum of mutant_statuses
+    status = Required(str, autostrip=False, index=True)  # really an enum of mutant_statuses
+    killed_by = Optional(str, autostrip=False)  # id of the test that killed the mutant
+    scope_fingerprint = Optional(str, autostrip=False)  # see mutmut.scope_fingerprints
+    scope_position = Optional(str, autostrip=False)  # the place of the mutant in its scope
+    composite_index(line, index)
+
+
+class FingerprintOfTestFiles(db.Entity):
+    fingerprint = PrimaryKey(str, auto=False)  # the tested_against_hash of the mutants tested against these files
+    files = Required(LongStr, autostrip=False)  # JSON of the [filename, hash] of every test file, the hash is null for the files the mutants weren't tested against
+
+
+# seconds to wait for another process that writes to the cache
+BUSY_TIMEOUT = 30
+
+
+@db.on_connect(provider='sqlite')
+def configure_connection(db, connection):
+    """Readers and writers of other processes don't block each other in WAL mode,
+    so ``mutmut results`` works during a run and several runs can share the cache"""
+    cursor = connection.cursor()
+    cursor.execute('PRAGMA journal_mode = WAL')
+    cursor.execute('PRAGMA synchronous = NORMAL')
+
+
+@db_session(ddl=True)
+def migrate_db():
+    """Upgrade the tables of an existing cache to ``current_db_version`` in place,
+    so the results survive an upgrade of mutmut
+
+    :return: the version of the cache after the migrations, :obj:`None` for a new cache
+    :rtype: int | None
+    """
+    tables = {name for name, in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+    if not tables:
+        return None
+    if 'MiscData' not in tables:
+        return 1
+
+    row = db.execute("SELECT value FROM MiscData WHERE key = 'version'").fetchone()
+    version = int(row[0]) if row is not None else 1
+    while version < current_db_version and version + 1 in migrations:
+        for statement in migrations[version + 1]:
+            db.execute(statement)
+        version += 1
+        db.execute("UPDATE MiscData SET value = $value WHERE key = 'version'", {'value': str(version)})
+    return version
 
 
 def init_db(f):
@@ -56,30 +128,21 @@ def init_db(f):
     def wrapper(*args, **kwargs):
         if db.provider is None:
             cache_filename = os.path.join(os.getcwd(), '.mutmut-cache')
-            db.bind(provider='sqlite', filename=cache_filename, create_db=True)
+            db.bind(provider='sqlite', filename=cache_filename, create_db=True, timeout=BUSY_TIMEOUT)
+
+            existing_db_version = migrate_db()
 
             try:
                 db.generate_mapping(create_tables=True)
             except OperationalError:
                 pass
 
-            if os.path.exists(cache_filename):
-                # If the existing cache file is out of data, delete it and start over
-                with db_session:
-                    try:
-                        v = MiscData.get(key='version')
-                        if v is None:
-                            existing_db_version = 1
-                        else:
-                            existing_db_version = int(v.value)
-                    except (RowNotFound, ERDiagramError, OperationalError):
-                        existing_db_version = 1
-
-                if existing_db_version != current_db_version:
-                    print('mutmut cache is out of date, clearing it...')
-                    db.drop_all_tables(with_all_data=True)
-                    db.schema = None  # Pony otherwise thinks we've already created the tables
-                    db.generate_mapping(create_tables=True)
+            if existing_db_version is not None and existing_db_version != current_db_version:
+                # a cache that can't be migrated, delete it and start over
+                print('mutmut cache is out of date, clearing it...')
+                db.drop_all_tables(with_all_data=True)
+                db.schema = None  # Pony otherwise thinks we've already created the tables
+                db.generate_mapping(create_tables=True)
 
             with db_session:
                 v = get_or_create(MiscData, key='version')
@@ -89,6 +152,12 @@ def init_db(f):
     return wrapper
 
 
+@init_db
+def bind_cache():
+    """Bind the cache of the current directory, so it stays in use even if
+    the process changes directory afterwards"""
+
+
 def hash_of(filename):
     with open(filename, 'rb') as f:
         m = hashlib.sha256()
@@ -96,9 +165,7 @@ def hash_of(filename):
         return m.hexdigest()
 
 
-def hash_of_tests(tests_dirs):
-    m = hashlib.sha256()
-    found_something = False
+def find_test_files(tests_dirs):
     for tests_dir in tests_dirs:
         for root, dirs, files in os.walk(tests_dir):
             for filename in files:
@@ -106,14 +173,53 @@ def hash_of_tests(tests_dirs):
                     continue
                 if not filename.startswith('test') and not filename.endswith('_tests.py') and 'test' not in root:
                     continue
-                with open(os.path.join(root, filename), 'rb') as f:
-                    m.update(f.read())
-                    found_something = True
+                yield os.path.join(root, filename)
+
+
+def hash_of_tests(tests_dirs):
+    m = hashlib.sha256()
+    found_something = False
+    for filename in find_test_files(tests_dirs):
+        with open(filename, 'rb') as f:
+            m.update(f.read())
+            found_something = True
     if not found_something:
         return NO_TESTS_FOUND
     return m.hexdigest()
 
 
+def hashes_of_test_files(tests_dirs):
+    """The hash of every test file, by its normalized path
+
+    :rtype: dict[str, str]
+    """
+    return {os.path.normpath(filename): hash_of(filename) for filename in find_test_files(tests_dirs)}
+
+
+def files_of_tests(tests, test_file_hashes):
+    """The test files a mutant was tested against
+
+    :param tests: ids of the tests that ran like ``tests/test_foo.py::test_foo``,
+        :obj:`None` if the whole test suite ran
+    :type tests: list[str] | None
+    :param test_file_hashes: the result of :func:`hashes_of_test_files`
+    :rtype: list[str]
+    """
+    if tests:
+        filenames = sorted({os.path.normpath(x.split('::')[0]) for x in tests})
+        if all(x in test_file_hashes for x in filenames):
+            return filenames
+    # the whole suite ran, or tests we can't find the files of
+    return sorted(test_file_hashes)
+
+
+def fingerprint_of_test_files(files):
+    """:param files: ``[filename, hash]`` of the test files a mutant was tested against"""
+    m = hashlib.sha256()
+    m.update(json.dumps(files).encode())
+    return m.hexdigest()
+
+
 def get_apply_line(mutant):
     apply_line = 'mutmut apply {}'.format(mutant.id)
     return apply_line
@@ -173,10 +279,11 @@ def print_result_cache(show_diffs=False, dict_synonyms=None, only_this_file=None
                 if show_diffs:
                     with open(filename) as f:
                         source = f.read()
+                    listed = listed_mutation_ids(source, filename, dict_synonyms)
 
                     for x in mutants:
                         print('# mutant {}'.format(x.id))
-                        print(get_unified_diff(x.id, dict_synonyms, update_cache=False, source=source))
+                        print(get_unified_diff(x.id, dict_synonyms, update_cache=False, source=source, listed=listed))
                 else:
                     print(ranges([x.id for x in mutants]))
 
@@ -194,16 +301,26 @@ def print_result_ids_cache(desired_status):
     print(" ".join(str(mutant.id) for mutant in mutant_query))
 
 
-def get_unified_diff(argument, dict_synonyms, update_cache=True, source=None):
+def listed_mutation_ids(source, filename, dict_synonyms):
+    """All mutation ids of ``source`` with their edits, to show many mutants of
+    a file without parsing it once per mutant
+
+    :rtype: dict[RelativeMutationID, RelativeMutationID]
+    """
+    context = Context(source=source, filename=filename, dict_synonyms=dict_synonyms)
+    return {mutation_id: mutation_id for mutation_id in list_mutations(context)}
+
+
+def get_unified_diff(argument, dict_synonyms, update_cache=True, source=None, listed=None):
     filename, mutation_id = filename_and_mutation_id_from_pk(argument)
     if source is None:
         with open(filename) as f:
             source = f.read()
 
-    return _get_unified_diff(source, filename, mutation_id, dict_synonyms, update_cache)
+    return _get_unified_diff(source, filename, mutation_id, dict_synonyms, update_cache, listed=listed)
 
 
-def _get_unified_diff(source, filename, mutation_id, dict_synonyms, update_cache):
+def _get_unified_diff(source, filename, mutation_id, dict_synonyms, update_cache, listed=None):
 
     if update_cache:
         update_line_numbers(filename)
@@ -211,6 +328,9 @@ def _get_unified_diff(source, filename, mutation_id, dict_synonyms, update_cache
     if source is None:
         with open(filename) as f:
             source = f.read()
+    if listed is not None:
+        # the listed id carries the edit of the mutant, fall back to a full mutate if it's gone
+        mutation_id = listed.get(mutation_id, mutation_id)
     context = Context(
         source=source,
         filename=filename,
@@ -237,20 +357,29 @@ def create_junitxml_report(dict_synonyms, suspicious_policy, untested_policy):
     test_cases = []
     mutant_list = list(select(x for x in Mutant))
     for filename, mutants in groupby(mutant_list, key=lambda x: x.line.sourcefile.filename):
+        update_line_numbers(filename)
+        with open(filename) as f:
+            source = f.read()
+        listed = listed_mutation_ids(source, filename, dict_synonyms)
+
+        def diff_of(mutant):
+            mutation_id = RelativeMutationID(mutant.line.line, mutant.index, mutant.line.line_number)
+            return _get_unified_diff(source, filename, mutation_id, dict_synonyms, update_cache=False, listed=listed)
+
         for mutant in mutants:
             tc = TestCase("Mutant #{}".format(mutant.id), file=filename, line=mutant.line.line_number + 1, stdout=mutant.line.line)
             if mutant.status == BAD_SURVIVED:
-                tc.add_failure_info(message=mutant.status, output=get_unified_diff(mutant.id, dict_synonyms))
+                tc.add_failure_info(message=mutant.status, output=diff_of(mutant))
             if mutant.status == BAD_TIMEOUT:
-                tc.add_error_info(message=mutant.status, error_type="timeout", output=get_unified_diff(mutant.id, dict_synonyms))
+                tc.add_error_info(message=mutant.status, error_type="timeout", output=diff_of(mutant))
             if mutant.status == OK_SUSPICIOUS:
                 if suspicious_policy != 'ignore':
                     func = getattr(tc, 'add_{}_info'.format(suspicious_policy))
-                    func(message=mutant.status, output=get_unified_diff(mutant.id, dict_synonyms))
+                    func(message=mutant.status, output=diff_of(mutant))
             if mutant.status == UNTESTED:
                 if untested_policy != 'ignore':
                     func = getattr(tc, 'add_{}_info'.format(untested_policy))
-                    func(message=mutant.status, output=get_unified_diff(mutant.id, dict_synonyms))
+                    func(message=mutant.status, output=diff_of(mutant))
 
             test_cases.append(tc)
 
@@ -279,6 +408,7 @@ def create_html_report(dict_synonyms):
 
             with open(filename) as f:
                 source = f.read()
+            listed = listed_mutation_ids(source, filename, dict_synonyms)
 
             os.makedirs(dirname(report_filename), exist_ok=True)
             with open(join(report_filename + '.html'), 'w') as f:
@@ -305,7 +435,7 @@ def create_html_report(dict_synonyms):
                 def print_diffs(status):
                     mutants = mutants_by_status[status]
                     for mutant in sorted(mutants, key=lambda m: m.id):
-                        diff = _get_unified_diff(source, filename, RelativeMutationID(mutant.line.line, mutant.index, mutant.line.line_number), dict_synonyms, update_cache=False)
+                        diff = _get_unified_diff(source, filename, RelativeMutationID(mutant.line.line, mutant.index, mutant.line.line_number), dict_synonyms, update_cache=False, listed=listed)
                         f.write('<h3>Mutant %s</h3>' % mutant.id)
                         f.write('<pre>%s</pre>' % diff)
 
@@ -360,6 +490,8 @@ def update_line_numbers(filename):
     sourcefile = get_or_create(SourceFile, filename=filename)
     if hash == sourcefile.hash:
         return
+    # the lines are about to change, so the cached mutations don't match them anymore
+    sourcefile.mutations_key = ''
     cached_line_objects = list(sourcefile.lines.order_by(Line.line_number))
 
     cached_lines = [x.line for x in cached_line_objects]
@@ -398,6 +530,67 @@ def update_line_numbers(filename):
     sourcefile.hash = hash
 
 
+def mutations_cache_key(filename, dict_synonyms, config):
+    """The key of the mutations listed for the current content of ``filename``
+    with these settings, or :obj:`None` if the list can't be cached because a
+    ``pre_mutation_ast`` hook might skip different mutants every time
+
+    :rtype: str | None
+    """
+    if hasattr(mutmut_config, 'pre_mutation_ast'):
+        return None
+    mutation_types_to_apply = None
+    covered_lines = None
+    detect_equivalent = False
+    if config is not None:
+        mutation_types_to_apply = sorted(config.mutation_types_to_apply)
+        # the equivalent mutants are only marked in the cache when the file is listed
+        detect_equivalent = config.detect_equivalent
+        # --use-coverage and --use-patch-file only list the mutants of some lines, see should_exclude
+        if config.covered_lines_by_filename is not None:
+            covered_lines = config.covered_lines_by_filename.get(filename)
+            if covered_lines is None and config.coverage_data is not None:
+                covered_lines = config.coverage_data.get(coverage_filename(config, filename))
+            covered_lines = sorted(covered_lines) if covered_lines is not None else None
+    m = hashlib.sha256()
+    m.update(json.dumps([mutations_format, __version__, hash_of(filename), sorted(dict_synonyms), mutation_types_to_apply, covered_lines, detect_equivalent]).encode())
+    return m.hexdigest()
+
+
+@init_db
+@db_session
+def cached_mutations_by_file(keys_by_filename):
+    """The mutation ids of the files that were listed before with the same key
+
+    :param keys_by_filename: the result of :func:`mutations_cache_key` for every file
+    :type keys_by_filename: dict[str, str | None]
+    :rtype: dict[str, list[RelativeMutationID]]
+    """
+    result = {}
+    for filename, key in keys_by_filename.items():
+        if key is None:
+            continue
+        sourcefile = SourceFile.get(filename=filename)
+        if sourcefile is None or sourcefile.mutations_key != key:
+            continue
+        result[filename] = [
+            RelativeMutationID(line, index, line_number, filename=filename, edit=tuple(edit), mutation_type=mutation_type)
+            for line, line_number, index, edit, mutation_type in json.loads(sourcefile.mutations)
+        ]
+    return result
+
+
+@init_db
+@db_session
+def set_cached_mutations(filename, key, mutation_ids):
+    """Store the mutation ids listed for ``key``, see :func:`cached_mutations_by_file`"""
+    if key is None:
+        return
+    sourcefile = get_or_create(SourceFile, filename=filename)
+    sourcefile.mutations_key = key
+    sourcefile.mutations = json.dumps([[x.line, x.line_number, x.index, x.edit, x.mutation_type] for x in mutation_ids])
+
+
 @init_db
 @db_session
 def register_mutants(mutations_by_file):
@@ -418,71 +611,257 @@ def register_mutants(mutations_by_file):
 
 @init_db
 @db_session
-def update_mutant_status(file_to_mutate, mutation_id, status, tests_hash):
-    sourcefile = SourceFile.get(filename=file_to_mutate)
-    line = Line.get(sourcefile=sourcefile, line=mutation_id.line, line_number=mutation_id.line_number)
-    mutant = Mutant.get(line=line, index=mutation_id.index)
-    mutant.status = status
-    mutant.tested_against_hash = tests_hash
+def update_mutant_scopes(filename, mutation_ids, previous_results):
+    """Record the scope of every mutant of ``filename`` after it was listed again
+
+    A mutant whose scope fingerprint changed is tested again. A new mutant, on
+    a reformatted line for example, gets the result of the mutant that had the
+    same place in a scope with the same fingerprint before. Scopes with the
+    same code, like two copies of a method in different classes, have the same
+    fingerprint but can be tested by different tests, so their mutants are
+    tested again instead.
+
+    :param previous_results: the result of :func:`scoped_results` from before
+        the lines of the file were updated
+    """
+    sourcefile = SourceFile.get(filename=filename)
+    # all lines and mutants of the file at once instead of two queries per mutant
+    lines = {(x.line, x.line_number): x for x in select(x for x in Line if x.sourcefile == sourcefile)}
+    mutants = {(x.line.line, x.line.line_number, x.index): x for x in select(x for x in Mutant if x.line.sourcefile == sourcefile)}
+    mutants_by_place = Counter((x.scope_fingerprint, x.scope_position) for x in mutation_ids)
+    for mutation_id in mutation_ids:
+        mutant = mutants.get((mutation_id.line, mutation_id.line_number, mutation_id.index))
+        if mutant is None:
+            line = lines[mutation_id.line, mutation_id.line_number]
+            mutant = Mutant(line=line, index=mutation_id.index, status=UNTESTED)
+        if mutant.scope_fingerprint == mutation_id.scope_fingerprint and mutant.scope_position == mutation_id.scope_position:
+            continue
+
+        if not mutant.scope_fingerprint:
+            # new, or from before the scopes were recorded
+            place = (mutation_id.scope_fingerprint, mutation_id.scope_position)
+            previous = previous_results.get(place)
+            if previous is not None and mutant.status == UNTESTED and mutants_by_place[place] == 1:
+                mutant.status, mutant.tested_against_hash, mutant.killed_by = previous
+        elif mutant.scope_fingerprint != mutation_id.scope_fingerprint:
+            # the code the mutant depends on changed
+            mutant.status = UNTESTED
+            mutant.tested_against_hash = ''
+            mutant.killed_by = ''
+        mutant.scope_fingerprint = mutation_id.scope_fingerprint
+        mutant.scope_position = mutation_id.scope_position
 
 
 @init_db
 @db_session
-def get_cached_mutation_statuses(filename, mutations, hash_of_tests):
-    sourcefile = SourceFile.get(filename=filename)
-    assert sourcefile
+def scoped_results(filename):
+    """The results of the mutants of ``filename`` by their scope fingerprint
+    and their place in that scope, see :func:`update_mutant_scopes`. Places
+    that several mutants share are left out.
+
+    :rtype: dict[tuple[str, str], tuple[str, str, str]]
+    """
+    rows = select(
+        (m.scope_fingerprint, m.scope_position, m.status, m.tested_against_hash, m.killed_by)
+        for m in Mutant
+        if m.line.sourcefile.filename == filename and m.scope_fingerprint != ''
+    )
+    rows = list(rows)
+    mutants_by_place = Counter((fingerprint, position) for fingerprint, position, *_ in rows)
+    return {
+        (fingerprint, position): (status, tested_against_hash, killed_by)
+        for fingerprint, position, status, tested_against_hash, killed_by in rows
+        if mutants_by_place[fingerprint, position] == 1
+    }
 
-    line_obj_by_line = {}
 
-    result = {}
+@init_db
+@db_session
+def set_equivalent_mutants(filename, mutation_ids):
+    """Mark mutants found by :func:`mutmut.find_equivalent_mutants`, they are never tested"""
+    sourcefile = SourceFile.get(filename=filename)
+    for mutation_id in mutation_ids:
+        line = Line.get(sourcefile=sourcefile, line=mutation_id.line, line_number=mutation_id.line_number)
+        mutant = get_or_create(Mutant, line=line, index=mutation_id.index, defaults=dict(status=UNTESTED))
+        mutant.status = OK_EQUIVALENT
+        mutant.killed_by = ''
 
-    for mutation_id in mutations:
-        if mutation_id.line not in line_obj_by_line:
-            line_obj_by_line[mutation_id.line] = Line.get(sourcefile=sourcefile, line=mutation_id.line, line_number=mutation_id.line_number)
-        line = line_obj_by_line[mutation_id.line]
-        assert line
+
+@init_db
+@db_session
+def update_mutant_statuses(statuses, test_files_by_fingerprint=None):
+    """Write the statuses of several tested mutants in one transaction
+
+    :param statuses: ``(filename, mutation_id, status, killed_by, tested_against_hash)``
+        of every mutant
+    :type statuses: list[tuple[str, RelativeMutationID, str, str | None, str]]
+    :param test_files_by_fingerprint: the test files of the ``tested_against_hash``
+        that are fingerprints of test files, see :func:`fingerprint_of_test_files`
+    :type test_files_by_fingerprint: dict[str, list[list[str]]]
+    """
+    for fingerprint, files in (test_files_by_fingerprint or {}).items():
+        if FingerprintOfTestFiles.get(fingerprint=fingerprint) is None:
+            FingerprintOfTestFiles(fingerprint=fingerprint, files=json.dumps(files))
+
+    sourcefiles = {}
+    for filename, mutation_id, status, killed_by, tested_against_hash in statuses:
+        if filename not in sourcefiles:
+            sourcefiles[filename] = SourceFile.get(filename=filename)
+        line = Line.get(sourcefile=sourcefiles[filename], line=mutation_id.line, line_number=mutation_id.line_number)
         mutant = Mutant.get(line=line, index=mutation_id.index)
-        if mutant is None:
-            mutant = get_or_create(Mutant, line=line, index=mutation_id.index, defaults=dict(status=UNTESTED))
+        mutant.status = status
+        mutant.tested_against_hash = tested_against_hash
+        mutant.killed_by = killed_by or ''
+
+
+# seconds a tested mutant waits at most before its status is written to the cache
+STATUS_FLUSH_INTERVAL = 2.0
+
+
+class MutantStatusWriter(object):
+    """Collects the statuses of tested mutants and writes them to the cache in
+    one transaction every ``interval`` seconds, instead of one commit per mutant.
+
+    Call :meth:`flush` when the run ends or is interrupted, and
+    :meth:`flush_if_due` while waiting for results.
+    """
+    def __init__(self, tests_hash, test_file_hashes=None, interval=STATUS_FLUSH_INTERVAL):
+        """
+        :param tests_hash: the hash of all tests, what the mutants are tested
+            against without ``test_file_hashes``
+        :param test_file_hashes: the result of :func:`hashes_of_test_files`
+        """
+        self.tests_hash = tests_hash
+        self.test_file_hashes = test_file_hashes
+        self.interval = interval
+        self.pending = []
+        self.test_files_by_fingerprint = {}
+        self.last_flush = monotonic()
+
+    def add(self, filename, mutation_id, status, killed_by=None, tests=None):
+        """
+        :param tests: the tests the mutant was tested against, :obj:`None` for the whole suite
+        """
+        self.pending.append((filename, mutation_id, status, killed_by, self.tested_against_hash(tests)))
+        self.flush_if_due()
+
+    def tested_against_hash(self, tests):
+        if self.tests_hash == NO_TESTS_FOUND or not self.test_file_hashes:
+            return self.tests_hash
+        # the other test files are listed without a hash, a test file that
+        # isn't listed is new and might kill the mutant
+        tested_against = set(files_of_tests(tests, self.test_file_hashes))
+        files = [[x, self.test_file_hashes[x] if x in tested_against else None] for x in sorted(self.test_file_hashes)]
+        fingerprint = fingerprint_of_test_files(files)
+        self.test_files_by_fingerprint[fingerprint] = files
+        return fingerprint
+
+    def flush_if_due(self):
+        if monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            update_mutant_statuses(self.pending, self.test_files_by_fingerprint)
+            self.pending = []
+            self.test_files_by_fingerprint = {}
+        self.last_flush = monotonic()
+
+
+NEARBY_LINES = 10
 
-        result[mutation_id] = mutant.status
-        if mutant.status == OK_KILLED:
-            # We assume that if a mutant was killed, a change to the test
-            # suite will mean it's still killed
-            result[mutation_id] = mutant.status
-        else:
-            if mutant.tested_against_hash != hash_of_tests or \
-                    mutant.tested_against_hash == NO_TESTS_FOUND or \
-                    hash_of_tests == NO_TESTS_FOUND:
-                result[mutation_id] = UNTESTED
-            else:
-                result[mutation_id] = mutant.status
 
+@init_db
+@db_session
+def killing_tests(filename, line_number):
+    """The tests that killed mutants near ``line_number`` of ``filename``, closest first
+
+    :rtype: list[str]
+    """
+    sourcefile = SourceFile.get(filename=filename)
+    if sourcefile is None:
+        return []
+    first_line, last_line = line_number - NEARBY_LINES, line_number + NEARBY_LINES
+    kills = select(
+        (m.killed_by, m.line.line_number)
+        for m in Mutant
+        if m.line.sourcefile == sourcefile
+        if m.killed_by != '' and m.killed_by != KILLED_BY_COMPILE_ERROR and m.killed_by != KILLED_BY_IMPORT_ERROR
+        if m.line.line_number >= first_line and m.line.line_number <= last_line
+    )
+    result = []
+    for killed_by, _ in sorted(kills, key=lambda x: (abs(x[1] - line_number), x[0])):
+        if killed_by not in result:
+            result.append(killed_by)
     return result
 
 
+def cached_status(status, tested_against_hash, hash_of_tests, unchanged_fingerprints=()):
+    """The status of a mutant that was last tested against ``tested_against_hash``,
+    :obj:`UNTESTED` if it has to be tested again with the tests of ``hash_of_tests``
+
+    :param unchanged_fingerprints: the fingerprints of test files that are all
+        unchanged with no test file added since, see :func:`fingerprint_of_test_files`
+    """
+    if status in (OK_KILLED, OK_EQUIVALENT):
+        # We assume that if a mutant was killed, a change to the test
+        # suite will mean it's still killed. Equivalent mutants don't
+        # depend on the tests at all.
+        return status
+
+    if tested_against_hash == NO_TESTS_FOUND or hash_of_tests == NO_TESTS_FOUND:
+        return UNTESTED
+
+    if tested_against_hash != hash_of_tests and tested_against_hash not in unchanged_fingerprints:
+        return UNTESTED
+
+    return status
+
+
 @init_db
 @db_session
-def cached_mutation_status(filename, mutation_id, hash_of_tests):
+def get_cached_mutation_statuses(filename, mutations, hash_of_tests, test_file_hashes=None):
+    """The cached statuses of the ``mutations`` of ``filename``, read with one
+    query for the whole file
+
+    A mutant that survived is tested again when one of the test files it was
+    tested against changed or is gone, or when there is a new test file.
+
+    :type mutations: list[RelativeMutationID]
+    :param test_file_hashes: the result of :func:`hashes_of_test_files`
+    :rtype: dict[RelativeMutationID, str]
+    """
     sourcefile = SourceFile.get(filename=filename)
     assert sourcefile
-    line = Line.get(sourcefile=sourcefile, line=mutation_id.line, line_number=mutation_id.line_number)
-    assert line
-    mutant = Mutant.get(line=line, index=mutation_id.index)
-    if mutant is None:
-        mutant = get_or_create(Mutant, line=line, index=mutation_id.index, defaults=dict(status=UNTESTED))
 
-    if mutant.status == OK_KILLED:
-        # We assume that if a mutant was killed, a change to the test
-        # suite will mean it's still killed
-        return OK_KILLED
+    rows = select(
+        (m.line.line, m.line.line_number, m.index, m.status, m.tested_against_hash)
+        for m in Mutant
+        if m.line.sourcefile == sourcefile
+    )
+    cached = {(line, line_number, index): (status, tested_against_hash) for line, line_number, index, status, tested_against_hash in rows}
+
+    unchanged_fingerprints = set()
+    fingerprints = {tested_against_hash for _, tested_against_hash in cached.values()} - {hash_of_tests, ''}
+    if test_file_hashes is not None and fingerprints:
+        for x in FingerprintOfTestFiles.select(lambda x: x.fingerprint in fingerprints):
+            files = json.loads(x.files)
+            if not set(test_file_hashes) <= {name for name, _ in files}:
+                continue
+            if all(hash is None or test_file_hashes.get(name) == hash for name, hash in files):
+                unchanged_fingerprints.add(x.fingerprint)
 
-    if mutant.tested_against_hash != hash_of_tests or \
-            mutant.tested_against_hash == NO_TESTS_FOUND or \
-            hash_of_tests == NO_TESTS_FOUND:
-        return UNTESTED
+    result = {}
+    for mutation_id in mutations:
+        key = (mutation_id.line, mutation_id.line_number, mutation_id.index)
+        if key not in cached:
+            line = Line.get(sourcefile=sourcefile, line=mutation_id.line, line_number=mutation_id.line_number)
+            assert line
+            get_or_create(Mutant, line=line, index=mutation_id.index, defaults=dict(status=UNTESTED))
+            cached[key] = (UNTESTED, '')
+        result[mutation_id] = cached_status(*cached[key], hash_of_tests, unchanged_fingerprints)
 
-    return mutant.status
+    return result
 
 
 @init_db
@@ -515,6 +894,19 @@ def set_cached_test_time(baseline_time_elapsed, current_hash_of_tests):
     get_or_create(MiscData, key='hash_of_tests').value = current_hash_of_tests
 
 
+@init_db
+@db_session
+def cached_test_durations():
+    d = MiscData.get(key='test_durations')
+    return json.loads(d.value) if d else None
+
+
+@init_db
+@db_session
+def set_cached_test_durations(durations):
+    get_or_create(MiscData, key='test_durations').value = json.dumps(durations)
+
+
 @init_db
 @db_session
 def cached_hash_of_tests():
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Serve the mutated source of a module from memory through an import hook.
+
+The mutant is described by the ``MUTMUT_MUTANT_SPEC`` environment variable:
+either a JSON object ``{"filename": ..., "source": ...}`` or, for big sources,
+the path of a file that contains that JSON object. A :class:`MutantFinder` at
+the front of :data:`sys.meta_path` loads the mutated source instead of the file
+on disk whenever the module at ``filename`` is imported, so the source tree is
+never written to.
+
+The test process gets the finder through a ``sitecustomize`` module on
+``PYTHONPATH``. That module is a copy of this file, which is why it only uses
+the standard library.
+"""
+
+import json
+import os
+import sys
+from importlib.abc import MetaPathFinder
+from importlib.machinery import PathFinder, SourceFileLoader
+
+MUTANT_SPEC = 'MUTMUT_MUTANT_SPEC'
+
+# specs bigger than this are written to a file, environment variables are limited in size
+MAX_INLINE_SPEC_SIZE = 64 * 1024
+
+_hook_directory = None
+_saved_environment = None
+_parsed_spec = (None, None)
+
+
+def read_mutant_spec():
+    """The mutant described by ``MUTMUT_MUTANT_SPEC``
+
+    :return: the absolute filename and the mutated source, or :obj:`None`
+    :rtype: tuple[str, str] | None
+    """
+    global _parsed_spec
+    raw_spec = os.environ.get(MUTANT_SPEC)
+    if not raw_spec:
+        return None
+    if _parsed_spec[0] != raw_spec:
+        spec = raw_spec
+        if not spec.startswith('{'):
+            with open(spec) as f:
+                spec = f.read()
+        spec = json.loads(spec)
+        _parsed_spec = raw_spec, (os.path.normcase(os.path.abspath(spec['filename'])), spec['source'])
+    return _parsed_spec[1]
+
+
+def module_name_of(filename):
+    """The last part of the dotted name of the module at ``filename``"""
+    head, tail = os.path.split(filename)
+    name = os.path.splitext(tail)[0]
+    if name == '__init__':
+        name = os.path.basename(head)
+    return name
+
+
+class MutantLoader(SourceFileLoader):
+    def __init__(self, fullname, path, source):
+        super(MutantLoader, self).__init__(fullname, path)
+        self.source = source
+
+    def get_source(self, fullname):
+        return self.source
+
+    def get_code(self, fullname):
+        # don't read or write cached bytecode, it belongs to the original source
+        return compile(self.source, self.path, 'exec', dont_inherit=True)
+
+
+class MutantFinder(MetaPathFinder):
+    """Find modules like the regular path based import, but load the mutated
+    source for the module of the current mutant"""
+
+    def find_spec(self, fullname, path, target=None):
+        mutant = read_mutant_spec()
+        if mutant is None:
+            return None
+        filename, source = mutant
+        if fullname.rpartition('.')[2] != module_name_of(filename):
+            return None
+        spec = PathFinder.find_spec(fullname, path)
+        if spec is None or spec.origin is None:
+            return None
+        if os.path.normcase(os.path.abspath(spec.origin)) != filename:
+            return None
+        spec.loader = MutantLoader(fullname, spec.origin, source)
+        return spec
+
+    def invalidate_caches(self):
+        pass
+
+
+def install():
+    """Put the finder in front of the regular import machinery of this process"""
+    if not any(isinstance(x, MutantFinder) for x in sys.meta_path):
+        sys.meta_path.insert(0, MutantFinder())
+
+
+def hook_directory():
+    """A directory with a ``sitecustomize`` module that installs the finder,
+    created once per process
+
+    :rtype: str
+    """
+    global _hook_directory
+    if _hook_directory is None:
+        from shutil import copy
+        from tempfile import mkdtemp
+        _hook_directory = mkdtemp(prefix='mutmut-importhook-')
+        copy(__file__, os.path.join(_hook_directory, 'sitecustomize.py'))
+    return _hook_directory
+
+
+def remove_hook_directory():
+    global _hook_directory
+    if _hook_directory is not None:
+        from shutil import rmtree
+        rmtree(_hook_directory, ignore_errors=True)
+        _hook_directory = None
+
+
+def activate_mutant(context):
+    """Serve the mutant of ``context`` to this process and to the test
+    processes it starts
+
+    :type context: mutmut.Context
+    """
+    from mutmut import mutate
+
+    global _saved_environment
+    mutated, _ = mutate(context)
+    spec = json.dumps(dict(filename=os.path.abspath(context.filename), source=mutated))
+    if len(spec) > MAX_INLINE_SPEC_SIZE:
+        spec_filename = os.path.join(hook_directory(), 'mutant.json')
+        with open(spec_filename, 'w') as f:
+            f.write(spec)
+        spec = spec_filename
+
+    _saved_environment = {key: os.environ.get(key) for key in (MUTANT_SPEC, 'PYTHONPATH')}
+    python_path = [hook_directory()]
+    if os.environ.get('PYTHONPATH'):
+        python_path.append(os.environ['PYTHONPATH'])
+    os.environ['PYTHONPATH'] = os.pathsep.join(python_path)
+    os.environ[MUTANT_SPEC] = spec
+    install()
+
+
+def deactivate_mutant():
+    global _saved_environment
+    if _saved_environment is None:
+        return
+    for key, value in _saved_environment.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    _saved_environment = None
+
+
+if __name__ == 'sitecustomize':  # pragma: no cover (runs in the test process)
+    install()
+
+    # we shadow any other sitecustomize module, so run that one too
+    _this_directory = os.path.dirname(os.path.abspath(__file__))
+    del sys.modules['sitecustomize']
+    sys.path[:] = [x for x in sys.path if os.path.abspath(x or '.') != _this_directory]
+    try:
+        import sitecustomize  # noqa: F401
+    except ImportError:
+        pass
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Mutant schemata: all mutants of a module compiled into one source file.
+
+Every module level function that has mutants is replaced by a trampoline that
+dispatches to the original function or to one of its mutated copies, depending
+on the ``MUTANT_UNDER_TEST`` environment variable. The instrumented file is
+written once per file, after that selecting a mutant is just setting the
+environment variable.
+
+Mutants outside of module level functions (module level code, class bodies,
+decorators, decorated functions) and mutants that don't compile can't be
+selected at runtime and are tested by rewriting the file as usual.
+"""
+
+import os
+from io import open
+from shutil import move
+
+from parso import parse
+
+from mutmut import Context, list_mutations, mutate
+
+MUTANT_UNDER_TEST = 'MUTANT_UNDER_TEST'
+
+TRAMPOLINE = '''
+def _mutmut_trampoline(variants, original, args, kwargs):
+    import os
+    return variants.get(os.environ.get('MUTANT_UNDER_TEST'), original)(*args, **kwargs)
+
+'''
+
+# filename -> (instrumented source, set of mutation ids it can select)
+_schemata_by_filename = {}
+
+# files that currently have their instrumented source on disk
+_instrumented_files = set()
+
+
+def mutant_key(filename, mutation_id):
+    """The value of ``MUTANT_UNDER_TEST`` that selects a mutant
+
+    :type filename: str
+    :type mutation_id: mutmut.RelativeMutationID
+    :rtype: str
+    """
+    return '{}:{}:{}'.format(filename, mutation_id.line_number, mutation_id.index)
+
+
+def module_level_functions(source):
+    """Find the undecorated module level functions in ``source``
+
+    :return: list of ``(name, name_column, first_line, last_line)``, lines are 0-indexed and inclusive
+    :rtype: list[tuple[str, int, int, int]]
+    """
+    result = []
+    for node in parse(source).children:
+        if node.type == 'async_stmt':
+            node = node.children[1]
+        if node.type != 'funcdef':
+            continue
+        name = node.name
+        last_line = node.end_pos[0] - 1
+        if node.end_pos[1] == 0:
+            # the function ends with the newline of its last line
+            last_line -= 1
+        result.append((name.value, name.start_pos[1], node.start_pos[0] - 1, last_line))
+    return result
+
+
+def create_instrumented_source(context, mutation_ids):
+    """Create the schemata source of ``context.source`` for the given mutants
+
+    :type context: mutmut.Context
+    :type mutation_ids: list[mutmut.RelativeMutationID]
+
+    :return: the instrumented source and the mutation ids it can select
+    :rtype: tuple[str, set[mutmut.RelativeMutationID]]
+    """
+    source = context.source
+    lines = source.split('\n')
+    functions = module_level_functions(source)
+
+    def function_of(mutation_id):
+        for function in functions:
+            if function[2] <= mutation_id.line_number <= function[3]:
+                return function
+        return None
+
+    def renamed(function_lines, name, name_column, new_name):
+        first = function_lines[0]
+        assert first[name_column:name_column + len(name)] == name
+        return [first[:name_column] + new_name + first[name_column + len(name):]] + function_lines[1:]
+
+    variants_by_function = {}
+    for mutation_id in mutation_ids:
+        function = function_of(mutation_id)
+        if function is None:
+            continue
+        mutant_context = Context(
+            source=source,
+            mutation_id=mutation_id,
+            filename=context.filename,
+            dict_synonyms=context.dict_synonyms,
+            config=context.config,
+        )
+        mutated_lines = mutate(mutant_context)[0].split('\n')
+        if context.remove_newline_at_end:
+            mutated_lines.append('')
+        if len(mutated_lines) != len(lines):
+            continue
+        _, _, first_line, last_line = function
+        variant_lines = mutated_lines[first_line:last_line + 1]
+        try:
+            compile('\n'.join(variant_lines), context.filename, 'exec')
+        except SyntaxError:
+            # one broken variant would break the import of the whole
+            # instrumented module, the mutant is tested by rewriting the file
+            continue
+        variants_by_function.setdefault(function, []).append((mutation_id, variant_lines))
+
+    if not variants_by_function:
+        return source, set()
+
+    result = []
+    selectable = set()
+    position = 0
+    for function in sorted(variants_by_function, key=lambda x: x[2]):
+        name, name_column, first_line, last_line = function
+        result.extend(lines[position:first_line])
+        if not selectable:
+            result.extend(TRAMPOLINE.split('\n'))
+        original_name = '_mutmut_{}__orig'.format(name)
+        variants_name = '_mutmut_{}__variants'.format(name)
+        result.append('def {}(*args, **kwargs):'.format(name))
+        result.append('    return _mutmut_trampoline({}, {}, args, kwargs)'.format(variants_name, original_name))
+        result.append('')
+        result.extend(renamed(lines[first_line:last_line + 1], name, name_column, original_name))
+        variant_names = []
+        for i, (mutation_id, mutated_lines) in enumerate(variants_by_function[function]):
+            variant_name = '_mutmut_{}__mutant_{}'.format(name, i)
+            result.append('')
+            result.extend(renamed(mutated_lines, name, name_column, variant_name))
+            variant_names.append((mutant_key(context.filename, mutation_id), variant_name))
+            selectable.add(mutation_id)
+        result.append('')
+        result.append('{} = {{{}}}'.format(variants_name, ', '.join('{!r}: {}'.format(key, variant) for key, variant in variant_names)))
+        position = last_line + 1
+    result.extend(lines[position:])
+
+    instrumented = '\n'.join(result)
+    if context.remove_newline_at_end:
+        instrumented = instrumented[:-1]
+    return instrumented, selectable
+
+
+def schemata_of(context):
+    """The instrumented source of ``context.filename``, computed once per process
+
+    :type context: mutmut.Context
+    :rtype: tuple[str, set[mutmut.RelativeMutationID]]
+    """
+    if context.filename not in _schemata_by_filename:
+        list_context = Context(
+            source=context.source,
+            filename=context.filename,
+            dict_synonyms=context.dict_synonyms,
+            config=context.config,
+        )
+        mutation_ids = list_mutations(list_context)
+        _schemata_by_filename[context.filename] = create_instrumented_source(list_context, mutation_ids)
+    return _schemata_by_filename[context.filename]
+
+
+def instrument_file(filename, instrumented):
+    """Write the instrumented source, the original file is kept as a ``.bak``
+    file until :func:`restore_instrumented_files` is called."""
+    move(filename, filename + '.bak')
+    with open(filename, 'w') as f:
+        f.write(instrumented)
+    _instrumented_files.add(filename)
+
+
+def restore_instrumented_files():
+    """Put the original source back for all instrumented files"""
+    for filename in _instrumented_files:
+        move(filename + '.bak', filename)
+    _instrumented_files.clear()
+
+
+def activate_mutant(context):
+    """Select the mutant of ``context`` through the instrumented file
+
+    :type context: mutmut.Context
+    :return: :obj:`False` if the mutant can't be selected at runtime and has
+        to be written to disk instead
+    :rtype: bool
+    """
+    instrumented, selectable = schemata_of(context)
+    if context.mutation_id not in selectable:
+        restore_instrumented_files()
+        return False
+
+    if context.filename not in _instrumented_files:
+        restore_instrumented_files()
+        instrument_file(context.filename, instrumented)
+
+    os.environ[MUTANT_UNDER_TEST] = mutant_key(context.filename, context.mutation_id)
+    return True
+
+
+def deactivate_mutant():
+    os.environ.pop(MUTANT_UNDER_TEST, None)
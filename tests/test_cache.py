@@ -1,4 +1,11 @@
-from mutmut.cache import sequence_ops
+import os
+import sqlite3
+
+import pytest
+
+import mutmut.cache
+from mutmut import RelativeMutationID, BAD_SURVIVED, OK_KILLED, UNTESTED
+from mutmut.cache import sequence_ops, bind_cache, get_cached_mutation_statuses, current_db_version, MutantStatusWriter
 
 
 def test_sequence_ops():
@@ -38,3 +45,69 @@ def test_sequence_ops():
         ('equal', 'f', 5, 'f', 6),
         ('delete', 'g', 6, None, None),
     ]
+
+
+@pytest.fixture
+def version_4_cache(tmpdir):
+    """A cache of mutmut 2.4, before killed_by and the cached mutation lists"""
+    os.chdir(str(tmpdir))
+    connection = sqlite3.connect('.mutmut-cache')
+    connection.executescript("""
+        CREATE TABLE "MiscData" ("key" TEXT NOT NULL PRIMARY KEY, "value" TEXT NOT NULL);
+        CREATE TABLE "SourceFile" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "filename" TEXT NOT NULL, "hash" TEXT NOT NULL);
+        CREATE TABLE "Line" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "sourcefile" INTEGER NOT NULL REFERENCES "SourceFile" ("id") ON DELETE CASCADE, "line" TEXT NOT NULL, "line_number" INTEGER NOT NULL);
+        CREATE INDEX "idx_line__sourcefile" ON "Line" ("sourcefile");
+        CREATE TABLE "Mutant" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "line" INTEGER NOT NULL REFERENCES "Line" ("id") ON DELETE CASCADE, "index" INTEGER NOT NULL, "tested_against_hash" TEXT NOT NULL, "status" TEXT NOT NULL);
+        CREATE INDEX "idx_mutant__line" ON "Mutant" ("line");
+        INSERT INTO "MiscData" VALUES ('version', '4');
+        INSERT INTO "SourceFile" VALUES (1, 'foo.py', 'abc');
+        INSERT INTO "Line" VALUES (1, 1, 'a = 1', 0);
+        INSERT INTO "Mutant" VALUES (1, 1, 0, 'hash of tests', 'bad_survived');
+        INSERT INTO "Mutant" VALUES (2, 1, 1, 'hash of tests', 'ok_killed');
+    """)
+    connection.commit()
+    connection.close()
+
+    yield tmpdir
+
+    # forget the cache of this directory, see the fixtures of test_main
+    mutmut.cache.db.provider = None
+    mutmut.cache.db.schema = None
+
+
+def test_old_cache_is_migrated_in_place(version_4_cache, capsys):
+    bind_cache()
+    assert 'clearing' not in capsys.readouterr().out
+
+    mutation_ids = [RelativeMutationID('a = 1', 0, 0), RelativeMutationID('a = 1', 1, 0)]
+    assert get_cached_mutation_statuses('foo.py', mutation_ids, 'hash of tests') == {
+        mutation_ids[0]: BAD_SURVIVED,
+        mutation_ids[1]: OK_KILLED,
+    }
+
+    connection = sqlite3.connect('.mutmut-cache')
+    assert connection.execute("SELECT value FROM MiscData WHERE key = 'version'").fetchone() == (str(current_db_version),)
+    assert connection.execute('SELECT killed_by FROM Mutant').fetchall() == [('',), ('',)]
+    indexes = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_line__sourcefile_line_line_number', 'idx_mutant__line_index', 'idx_mutant__status'} <= indexes
+    connection.close()
+
+
+def test_survivors_are_tested_again_when_their_test_files_change_or_one_is_added(version_4_cache):
+    bind_cache()
+    mutation_id = RelativeMutationID('a = 1', 0, 0)
+    test_file_hashes = {'tests/test_foo.py': 'foo', 'tests/test_bar.py': 'bar'}
+    statuses = MutantStatusWriter('hash of tests', test_file_hashes)
+    statuses.add('foo.py', mutation_id, BAD_SURVIVED, tests=['tests/test_foo.py::test_foo'])
+    statuses.flush()
+
+    def cached_status(test_file_hashes):
+        return get_cached_mutation_statuses('foo.py', [mutation_id], 'new hash of tests', test_file_hashes)[mutation_id]
+
+    assert cached_status(test_file_hashes) == BAD_SURVIVED
+    # the mutant wasn't tested against test_bar.py
+    assert cached_status({'tests/test_foo.py': 'foo', 'tests/test_bar.py': 'changed'}) == BAD_SURVIVED
+    assert cached_status({'tests/test_foo.py': 'foo'}) == BAD_SURVIVED
+    assert cached_status({'tests/test_foo.py': 'changed', 'tests/test_bar.py': 'bar'}) == UNTESTED
+    assert cached_status({'tests/test_bar.py': 'bar'}) == UNTESTED
+    assert cached_status(dict(test_file_hashes, **{'tests/test_baz.py': 'baz'})) == UNTESTED
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from mutmut import Context, list_mutations
+from mutmut.importhook import activate_mutant, deactivate_mutant, module_name_of, remove_hook_directory, \
+    MAX_INLINE_SPEC_SIZE, MUTANT_SPEC
+
+
+@pytest.fixture
+def foo(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    monkeypatch.delenv('PYTHONPATH', raising=False)
+    yield tmpdir
+    deactivate_mutant()
+    remove_hook_directory()
+
+
+def imported_x():
+    return subprocess.check_output([sys.executable, '-c', 'import foo; print(foo.x)']).decode().strip()
+
+
+def mutant_context(source):
+    with open('foo.py', 'w') as f:
+        f.write(source)
+    context = Context(source=source, filename='foo.py')
+    return Context(source=source, filename='foo.py', mutation_id=list_mutations(context)[0])
+
+
+def test_module_name_of():
+    assert module_name_of('/src/foo.py') == 'foo'
+    assert module_name_of('/src/foo/__init__.py') == 'foo'
+
+
+def test_import_hook(foo):
+    source = 'x = 1\n'
+    activate_mutant(mutant_context(source))
+    assert imported_x() == '2'
+    deactivate_mutant()
+    assert imported_x() == '1'
+    with open('foo.py') as f:
+        assert f.read() == source
+
+
+def test_import_hook_big_module(foo):
+    source = 'x = 1\n' + '#' * MAX_INLINE_SPEC_SIZE + '\n'
+    activate_mutant(mutant_context(source))
+    assert not os.environ[MUTANT_SPEC].startswith('{')
+    assert imported_x() == '2'
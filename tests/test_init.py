@@ -1,6 +1,9 @@
+import os
+import sys
 
 from pathlib import Path
 from time import sleep
+from parso import parse
 from pytest import raises, fixture
 from unittest.mock import MagicMock, patch
 
@@ -12,8 +15,35 @@ from mutmut import (
     close_active_queues,
     read_patch_data,
     OK_KILLED,
+    BAD_SURVIVED,
     Context, 
-    mutate)
+    mutate,
+    mutate_file,
+    create_workspace,
+    enter_workspace,
+    RelativeMutationID,
+    covering_tests,
+    format_test_command,
+    killers_first,
+    killed_by_from_output,
+    durations_from_output,
+    pytest_durations_arguments,
+    mutant_timeout,
+    mutant_context,
+    list_mutations_by_file,
+    list_mutations,
+    find_equivalent_mutants,
+    compile_fails,
+    module_name_and_root,
+    changed_lines_from_diff,
+    widen_to_functions,
+    parse_sample_size,
+    sample_mutations,
+    mutation_score_interval,
+    scope_fingerprints,
+    MutantDispatcher,
+    WORKER_TIMEOUT)
+from mutmut.cache import MutantStatusWriter, files_of_tests
 
 
 def test_partition_node_list_no_nodes():
@@ -43,24 +73,29 @@ def check_mutants_stub(**kwargs):
 
 class ConfigStub:
     hash_of_tests = None
+    test_file_hashes = None
+    jobs = 1
+    dict_synonyms = []
 config_stub = ConfigStub()
 
-def test_run_mutation_tests_thread_synchronization(monkeypatch):
+def test_run_mutation_tests_thread_synchronization(monkeypatch, tmpdir):
     # arrange
     total_mutants = 3
     cycle_process_after = 1
+    monkeypatch.chdir(tmpdir)
+    (tmpdir / 'foo.py').write('a = 1\n')
 
     def queue_mutants_stub(**kwargs):
         for _ in range(total_mutants):
-            kwargs['mutants_queue'].put(('mutant', Context(config=config_stub)))
+            kwargs['mutants_queue'].put(('mutant', (0, 0, 0, None)))
         kwargs['mutants_queue'].put(('end', None))
     monkeypatch.setattr('mutmut.queue_mutants', queue_mutants_stub)
 
-    def update_mutant_status_stub(**_):
+    def update_mutant_statuses_stub(*_):
         sleep(0.1)
 
     monkeypatch.setattr('mutmut.check_mutants', check_mutants_stub)
-    monkeypatch.setattr('mutmut.cache.update_mutant_status', update_mutant_status_stub)
+    monkeypatch.setattr('mutmut.cache.update_mutant_statuses', update_mutant_statuses_stub)
     monkeypatch.setattr('mutmut.CYCLE_PROCESS_AFTER', cycle_process_after)
 
     progress_mock = MagicMock()
@@ -72,13 +107,95 @@ def test_run_mutation_tests_thread_synchronization(monkeypatch):
     progress_mock.register = progress_mock_register
 
     # act
-    run_mutation_tests(config_stub, progress_mock, None)
+    run_mutation_tests(config_stub, progress_mock, {'foo.py': []})
 
     # assert
     assert progress_mock.registered_mutants == total_mutants
 
     close_active_queues()
 
+
+def test_mutant_status_writer(monkeypatch):
+    batches = []
+    monkeypatch.setattr('mutmut.cache.update_mutant_statuses', lambda statuses, test_files: batches.append((statuses, test_files)))
+    mutation_id = RelativeMutationID('a = 1', 0, 1)
+
+    statuses = MutantStatusWriter('hash', interval=60)
+    statuses.add('foo.py', mutation_id, OK_KILLED, killed_by='test_foo')
+    statuses.add('bar.py', mutation_id, BAD_SURVIVED)
+    assert batches == []
+    statuses.flush()
+    assert batches == [([('foo.py', mutation_id, OK_KILLED, 'test_foo', 'hash'), ('bar.py', mutation_id, BAD_SURVIVED, None, 'hash')], {})]
+    statuses.flush()
+    assert len(batches) == 1
+
+    statuses = MutantStatusWriter('hash', interval=0)
+    statuses.add('foo.py', mutation_id, OK_KILLED)
+    assert len(batches) == 2
+
+
+def test_mutant_status_writer_fingerprints_the_test_files(monkeypatch):
+    batches = []
+    monkeypatch.setattr('mutmut.cache.update_mutant_statuses', lambda statuses, test_files: batches.append((statuses, test_files)))
+    mutation_id = RelativeMutationID('a = 1', 0, 1)
+    test_file_hashes = {'tests/test_foo.py': 'foo', 'tests/test_bar.py': 'bar'}
+
+    statuses = MutantStatusWriter('hash', test_file_hashes, interval=60)
+    statuses.add('foo.py', mutation_id, BAD_SURVIVED, tests=['tests/test_foo.py::test_a', 'tests/test_foo.py::test_b'])
+    statuses.add('foo.py', mutation_id, BAD_SURVIVED)
+    statuses.flush()
+
+    (only_foo, everything), test_files = batches[0]
+    assert test_files == {
+        only_foo[-1]: [['tests/test_bar.py', None], ['tests/test_foo.py', 'foo']],
+        everything[-1]: [['tests/test_bar.py', 'bar'], ['tests/test_foo.py', 'foo']],
+    }
+
+
+def test_files_of_tests():
+    test_file_hashes = {'tests/test_foo.py': 'foo', 'tests/test_bar.py': 'bar'}
+    assert files_of_tests(['tests/test_foo.py::test_a', './tests/test_foo.py::test_b'], test_file_hashes) == ['tests/test_foo.py']
+    # the whole suite
+    assert files_of_tests(None, test_file_hashes) == ['tests/test_bar.py', 'tests/test_foo.py']
+    # a test we don't know the file of
+    assert files_of_tests(['test_foo.test_a'], test_file_hashes) == ['tests/test_bar.py', 'tests/test_foo.py']
+
+
+def test_scope_fingerprints():
+    source = """X = 1
+
+def f(a):
+    return g(a) + 1
+
+def g(a):
+    return a * X
+
+def h():
+    return 3
+
+class C:
+    def m(self):
+        return self.n()
+
+    def n(self):
+        return 4
+"""
+
+    def changed_lines(new_source):
+        before = scope_fingerprints(parse(source))
+        after = scope_fingerprints(parse(new_source))
+        return sorted(i for i in range(len(source.splitlines())) if before[i][0] != after[i][0])
+
+    assert scope_fingerprints(parse(source))[3] == scope_fingerprints(parse(source))[2]
+    assert scope_fingerprints(parse(source))[3][1] == (3, 0)
+    assert changed_lines(source.replace('return 3', 'return 5')) == [8, 9]
+    # f calls g, which uses X
+    assert changed_lines(source.replace('X = 1', 'X = 2')) == [0, 2, 3, 5, 6]
+    assert changed_lines(source.replace('return 4', 'return 5')) == [11, 12, 13, 14, 15, 16]
+    # reformatting and comments don't count
+    assert changed_lines(source.replace('a * X', 'a*X  # times X')) == []
+
+
 @fixture
 def testpatches_path(testdata: Path):
     return testdata / "test_patches"
@@ -168,3 +285,304 @@ def test_read_patch_data_mutliple_files(testpatches_path: Path):
 
     # assert
     assert actual_changes == expected_changes
+
+
+def test_mutate_file_in_workspace_does_not_touch_original(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    (tmpdir / 'foo.py').write('a = 1\n')
+    (tmpdir / '.mutmut-cache').write('')
+
+    (tmpdir / 'html').ensure('index.html')
+    (tmpdir / 'tests' / '.git').ensure('config')
+    (tmpdir / 'tests' / 'fixture.py').write('b = 1\n')
+    (tmpdir / '.venv' / 'bin').ensure('python')
+    (tmpdir / 'node_modules' / 'foo').ensure('index.js')
+
+    workspace = Path(create_workspace(tests_dirs=['tests']))
+    assert not (workspace / '.mutmut-cache').exists()
+    assert not (workspace / '.venv').exists()
+    assert not (workspace / 'node_modules').exists()
+    # the python files of the tests are copied, a test writing to them doesn't touch the original
+    (workspace / 'tests' / 'fixture.py').write_text('b = 2\n')
+    assert (tmpdir / 'tests' / 'fixture.py').read() == 'b = 1\n'
+    # only the names at the top of the project are left out
+    assert (workspace / 'html' / 'index.html').exists()
+    assert (workspace / 'tests' / '.git' / 'config').exists()
+
+    monkeypatch.chdir(workspace)
+    original, mutated = mutate_file(
+        backup=True,
+        context=Context(filename='foo.py', mutation_id=RelativeMutationID('a = 1', 0, line_number=0)),
+    )
+    assert mutated == 'a = 2\n'
+    assert (workspace / 'foo.py').read_text() == 'a = 2\n'
+    assert (tmpdir / 'foo.py').read() == 'a = 1\n'
+
+
+def test_enter_workspace_uses_the_copies_of_the_project_paths(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    (tmpdir / 'src').ensure('foo.py')
+    workspace = create_workspace()
+    monkeypatch.setattr('mutmut.cache.bind_cache', lambda: None)
+    monkeypatch.setattr(sys, 'path', ['', str(tmpdir / 'src'), str(tmpdir / '.venv'), '/usr/lib/python3'])
+    monkeypatch.setenv('PYTHONPATH', '/other')
+
+    enter_workspace(workspace)
+
+    assert os.getcwd() == workspace
+    # .venv has no copy in the workspace
+    assert sys.path == ['', os.path.join(workspace, 'src'), str(tmpdir / '.venv'), '/usr/lib/python3']
+    assert os.environ['PYTHONPATH'] == os.pathsep.join([os.path.join(workspace, 'src'), '/other'])
+
+
+def test_mutant_dispatcher_hands_out_the_mutants_of_lost_workers_again(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr('mutmut.time', lambda: now[0])
+    first, second = ('mutant', (0, 1, 0, None)), ('mutant', (0, 2, 0, None))
+
+    dispatcher = MutantDispatcher(mutant_time_limit=100)
+    assert dispatcher.take('a') == ('wait', None)
+    dispatcher.put(first)
+    dispatcher.put(second)
+    dispatcher.put(('end', None))
+    assert dispatcher.take('a') == first
+    assert dispatcher.take('b') == second
+
+    # b sends heartbeats, a is gone
+    now[0] = WORKER_TIMEOUT + 1
+    dispatcher.heartbeat('b')
+    dispatcher.requeue_lost()
+    assert dispatcher.take('b') == first
+    # the first status of a mutant counts, another one is from a worker it was taken from
+    assert dispatcher.done(0, 1, 0)
+    assert not dispatcher.done(0, 1, 0)
+    assert not dispatcher.finished()
+    assert dispatcher.take('b') == ('wait', None)
+
+    # b takes longer than any mutant can
+    now[0] += 101
+    dispatcher.heartbeat('b')
+    dispatcher.requeue_lost()
+    assert dispatcher.take('c') == second
+    assert dispatcher.done(0, 2, 0)
+    assert dispatcher.finished()
+    assert dispatcher.take('b') == ('end', None)
+
+
+def test_covering_tests(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+
+    class CoverageConfigStub:
+        project_dir = str(tmpdir)
+        coverage_data = {
+            str(tmpdir / 'foo.py'): {
+                2: ['', 'tests/test_foo.py::test_b|run', 'tests/test_foo.py::test_a|setup', 'tests/test_foo.py::test_a|run'],
+            },
+        }
+
+    context = Context(filename='foo.py', config=CoverageConfigStub(), mutation_id=RelativeMutationID('a = 1', 0, line_number=1))
+    assert covering_tests(context) == ['tests/test_foo.py::test_a', 'tests/test_foo.py::test_b']
+
+    context = Context(filename='foo.py', config=CoverageConfigStub(), mutation_id=RelativeMutationID('a = 1', 0, line_number=0))
+    assert covering_tests(context) == []
+
+    CoverageConfigStub.coverage_data = None
+    assert covering_tests(context) == []
+
+
+def test_format_test_command():
+    assert format_test_command('python -m pytest -x {tests}', ['tests/test_foo.py::test_a', 'tests/test_foo.py::test[a b]']) == \
+        "python -m pytest -x tests/test_foo.py::test_a 'tests/test_foo.py::test[a b]'"
+    assert format_test_command('python -m pytest -x {tests}', []) == 'python -m pytest -x '
+    assert format_test_command('python -m pytest -x', ['tests/test_foo.py::test_a']) == 'python -m pytest -x'
+
+
+def test_killers_first():
+    tests = ['tests/test_a.py::test_a', 'tests/test_a.py::test_b', 'tests/test_b.py::test_c']
+    assert killers_first(tests, []) == tests
+    assert killers_first(tests, ['tests/test_b.py::test_c', 'tests/test_x.py::test_x', 'tests/test_a.py::test_b']) == \
+        ['tests/test_b.py::test_c', 'tests/test_a.py::test_b', 'tests/test_a.py::test_a']
+
+
+def test_killed_by_from_output():
+    assert killed_by_from_output([
+        '============================= test session starts ==============================\n',
+        'FAILED tests/test_foo.py::test_a - assert 1 == 2\n',
+        'FAILED tests/test_foo.py::test_b\n',
+    ]) == 'tests/test_foo.py::test_a'
+    assert killed_by_from_output(['\x1b[31mFAILED\x1b[0m tests/test_foo.py::\x1b[1mtest_b\x1b[0m - assert 0\r\n']) == 'tests/test_foo.py::test_b'
+    assert killed_by_from_output(['1 passed in 0.01s\n']) is None
+
+
+def test_pytest_durations_arguments(monkeypatch):
+    import pytest
+    monkeypatch.setattr(pytest, '__version__', '6.1.2')
+    assert pytest_durations_arguments() == ' --durations=0'
+    monkeypatch.setattr(pytest, '__version__', '6.2.0')
+    assert pytest_durations_arguments() == ' --durations=0 --durations-min=0'
+    monkeypatch.setattr(pytest, '__version__', '8.0.0rc1')
+    assert pytest_durations_arguments() == ' --durations=0 --durations-min=0'
+
+
+def test_durations_from_output():
+    assert durations_from_output([
+        '============================= slowest durations ==============================\n',
+        '0.50s call     tests/test_foo.py::test_a\n',
+        '\x1b[1m0.25s setup    tests/test_foo.py::test_a\x1b[0m\r\n',
+        '0.10s teardown tests/test_foo.py::test[a b]\n',
+        '=========================== 2 passed in 0.91s ============================\n',
+    ]) == {'tests/test_foo.py::test_a': 0.75, 'tests/test_foo.py::test[a b]': 0.1}
+
+
+def test_mutant_timeout():
+    class DurationsConfigStub:
+        baseline_time_elapsed = 3.0
+        test_durations = {'tests/test_foo.py::test_a': 0.5, 'tests/test_foo.py::test_b': 1.5}
+
+    config = DurationsConfigStub()
+    assert mutant_timeout(config, ['tests/test_foo.py::test_a']) == (1.0 + 0.5) * 10
+    assert mutant_timeout(config, ['tests/test_foo.py::test_a', 'tests/test_foo.py::test_b']) == 3.0 * 10
+    assert mutant_timeout(config, ['tests/test_foo.py::test_new']) is None
+    assert mutant_timeout(config, []) is None
+
+    config.test_durations = None
+    assert mutant_timeout(config, ['tests/test_foo.py::test_a']) is None
+
+
+def test_mutant_context():
+    files = [('foo.py', 'a = 1\n'), ('bar.py', 'def f():\n    return 2 + 3\n')]
+    context = mutant_context(config_stub, files, (1, 1, 1, None))
+    assert context.filename == 'bar.py'
+    assert context.mutation_id == RelativeMutationID(line='    return 2 + 3', index=1, line_number=1)
+    assert context.config is not config_stub
+    assert context.source == files[1][1]
+
+
+def test_list_mutations_by_file_in_processes(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    filenames = []
+    for i in range(4):
+        (tmpdir / 'foo{}.py'.format(i)).write('a = {}\nb = a + {}\n'.format(i, i))
+        filenames.append('foo{}.py'.format(i))
+
+    serial = list(list_mutations_by_file(filenames, [], None))
+    assert [filename for filename, _, _ in serial] == filenames
+    assert list(list_mutations_by_file(filenames, [], None, jobs=2)) == serial
+
+    (tmpdir / 'foo2.py').write('a = (\n')
+    with raises(RuntimeError, match='foo2.py'):
+        list(list_mutations_by_file(filenames, [], None, jobs=2))
+
+
+def test_find_equivalent_mutants(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+    source = 'def foo(a):\n    if False:\n        return "a"\n    return a + 1.5 - 0.5\n'
+    (tmpdir / 'foo.py').write(source)
+    mutation_ids = list_mutations(Context(source=source, filename='foo.py'))
+
+    equivalent = find_equivalent_mutants('foo.py', mutation_ids)
+    # the compiler removes the branch, so the mutated string doesn't end up in the bytecode
+    assert [mutate(Context(source=source, mutation_id=x))[0].split('\n')[2] for x in equivalent] == ['        return "XXaXX"']
+
+    # the second of two mutants that fold to the same constant
+    source = 'a = 1.0 + 0.5\n'
+    (tmpdir / 'foo.py').write(source)
+    mutation_ids = list_mutations(Context(source=source, filename='foo.py'))
+    assert find_equivalent_mutants('foo.py', mutation_ids) == [mutation_ids[2]]
+
+
+def test_compile_fails():
+    source = "def foo(kwargs):\n    return {**kwargs, 'a': 1}\n"
+    mutation_ids = list_mutations(Context(source=source, filename='foo.py'))
+    assert [compile_fails(Context(source=source, filename='foo.py', mutation_id=x)) for x in mutation_ids] == [True, False, False]
+
+
+def test_module_name_and_root(tmpdir):
+    (tmpdir / 'src' / 'pkg' / 'sub').ensure('__init__.py')
+    (tmpdir / 'src' / 'pkg').ensure('__init__.py')
+    assert module_name_and_root(str(tmpdir / 'src' / 'pkg' / 'sub' / 'foo.py')) == ('pkg.sub.foo', str(tmpdir / 'src'))
+    assert module_name_and_root(str(tmpdir / 'src' / 'pkg' / '__init__.py')) == ('pkg', str(tmpdir / 'src'))
+    assert module_name_and_root(str(tmpdir / 'foo.py')) == ('foo', str(tmpdir))
+
+
+def test_changed_lines_from_diff():
+    diff = """diff --git a/foo.py b/foo.py
+index 1111111..2222222 100644
+--- a/foo.py
++++ b/foo.py
+@@ -3 +3 @@ def foo():
+-    return 1
++    return 2
+@@ -10,2 +10,3 @@ def bar():
+-    a
+-    b
++    a
++    b
++    c
+@@ -20,2 +19,0 @@ def baz():
+-    x
+-    y
+diff --git a/old.py b/new.py
+similarity index 90%
+rename from old.py
+rename to new.py
+--- a/old.py
++++ b/new.py
+@@ -1,0 +2 @@
++import os
+"""
+    assert changed_lines_from_diff(diff) == {'foo.py': {3, 10, 11, 12, 19}, 'new.py': {2}}
+
+
+def test_widen_to_functions():
+    source = """import os
+
+def foo():
+    a = 1
+
+    def bar():
+        return 2
+    return a
+
+x = 3
+"""
+    assert widen_to_functions(source, {4}) == {3, 4, 5, 6, 7, 8}
+    assert widen_to_functions(source, {7}) == {6, 7}
+    assert widen_to_functions(source, {10}) == {10}
+
+
+def test_parse_sample_size():
+    assert parse_sample_size('10%', 95) == 10
+    assert parse_sample_size('100%', 95) == 95
+    assert parse_sample_size('50', 95) == 50
+    assert parse_sample_size('500', 95) == 95
+    for sample in ['0', '-1', '0%', '101%', 'a lot']:
+        with raises(ValueError):
+            parse_sample_size(sample, 95)
+
+
+def test_sample_mutations():
+    def mutation_ids(filename, number, mutation_type):
+        return [RelativeMutationID(mutation_type, i, i, filename=filename, mutation_type=mutation_type) for i in range(number)]
+
+    mutations_by_file = {
+        'foo.py': mutation_ids('foo.py', 60, 'number') + mutation_ids('foo.py', 20, 'operator'),
+        'bar.py': mutation_ids('bar.py', 20, 'number'),
+    }
+    sample = sample_mutations(mutations_by_file, 10, seed=0)
+    assert list(sample) == ['foo.py', 'bar.py']
+    assert [x.mutation_type for x in sample['foo.py']].count('number') == 6
+    assert [x.mutation_type for x in sample['foo.py']].count('operator') == 2
+    assert len(sample['bar.py']) == 2
+    assert sample == sample_mutations(mutations_by_file, 10, seed=0)
+
+    # every mutant ends up in the full sample, in the original order
+    assert sample_mutations(mutations_by_file, 100, seed=1) == mutations_by_file
+
+
+def test_mutation_score_interval():
+    low, high = mutation_score_interval(80, 100)
+    assert round(low, 3) == 0.711
+    assert round(high, 3) == 0.867
+    assert mutation_score_interval(10, 10)[1] == 1.0
+    assert mutation_score_interval(0, 0) == (0.0, 1.0)
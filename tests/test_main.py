@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
+import json
 import os
+import socket
+import sqlite3
+import stat
 import subprocess
 import sys
 import xml.etree.ElementTree as ET
@@ -8,7 +12,7 @@ from os import (
     mkdir,
 )
 from os.path import join
-from time import time
+from time import sleep, time
 from unittest.mock import (
     call,
     MagicMock,
@@ -26,8 +30,11 @@ from mutmut import (
     read_coverage_data,
     MUTANT_STATUSES,
     __version__,
+    list_mutations_of_file,
+    KILLED_BY_COMPILE_ERROR,
+    KILLED_BY_IMPORT_ERROR,
 )
-from mutmut.__main__ import climain
+from mutmut.__main__ import climain, serve_authkey, AUTHKEY_FILENAME
 
 file_to_mutate_lines = [
     "def foo(a, b):",
@@ -87,6 +94,44 @@ def single_mutant_filesystem(tmpdir):
     mutmut.cache.db.schema = None
 
 
+@pytest.fixture
+def equivalent_mutants_filesystem(tmpdir):
+    foo_py = """
+def foo(a):
+    if False:
+        return 'a'
+    return a + 1.5 - 0.5
+"""
+    create_filesystem(tmpdir, foo_py, "from foo import *\ndef test_foo():\n    assert foo(1) == 2\n")
+
+    yield tmpdir
+
+    # This is a hack to get pony to forget about the old db file
+    # otherwise Pony thinks we've already created the tables
+    import mutmut.cache
+    mutmut.cache.db.provider = None
+    mutmut.cache.db.schema = None
+
+
+@pytest.fixture
+def broken_mutants_filesystem(tmpdir):
+    foo_py = """
+def foo(a, kwargs):
+    return {**kwargs, a: a}[a]
+
+n = int('1')
+"""
+    create_filesystem(tmpdir, foo_py, "from foo import *\ndef test_foo():\n    assert foo(n, {}) == 1\n")
+
+    yield tmpdir
+
+    # This is a hack to get pony to forget about the old db file
+    # otherwise Pony thinks we've already created the tables
+    import mutmut.cache
+    mutmut.cache.db.provider = None
+    mutmut.cache.db.schema = None
+
+
 @pytest.fixture
 def surviving_mutants_filesystem(tmpdir):
     foo_py = """
@@ -655,6 +700,149 @@ def test_run_multiple_times_with_different_mutation_types(filesystem):
 """ in result.output, "no new mutation types added!"
 
 
+def test_rerun_reads_mutations_of_unchanged_files_from_cache(filesystem, monkeypatch):
+    CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--test-time-base=15.0"], catch_exceptions=False)
+
+    listed = []
+
+    def list_mutations_of_file_spy(filename, dict_synonyms, config):
+        listed.append(filename)
+        return list_mutations_of_file(filename, dict_synonyms, config)
+    monkeypatch.setattr('mutmut.list_mutations_of_file', list_mutations_of_file_spy)
+
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--test-time-base=15.0"], catch_exceptions=False)
+    assert result.exit_code == 0
+    assert listed == []
+    assert '{}/{}'.format(EXPECTED_MUTANTS, EXPECTED_MUTANTS) in result.output
+
+    with open(filesystem / 'foo.py', 'a') as f:
+        f.write('d = 7\n')
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--test-time-base=15.0"], catch_exceptions=False)
+    assert listed == ['foo.py']
+    assert '{}/{}'.format(EXPECTED_MUTANTS + 2, EXPECTED_MUTANTS + 2) in result.output
+
+
+def test_cache_is_written_while_another_process_reads_it(filesystem):
+    CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--test-time-base=15.0"], catch_exceptions=False)
+    with open(filesystem / 'tests' / 'test_foo.py', 'a') as f:
+        f.write('\n# changed tests, so the mutants are tested and written again\n')
+
+    reader = sqlite3.connect(str(filesystem / '.mutmut-cache'))
+    try:
+        assert reader.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+        reader.execute('BEGIN')
+        assert reader.execute('SELECT count(*) FROM Mutant').fetchone() == (EXPECTED_MUTANTS,)
+
+        result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--test-time-base=15.0"], catch_exceptions=False)
+        assert result.exit_code == 0
+        assert '{}/{}'.format(EXPECTED_MUTANTS, EXPECTED_MUTANTS) in result.output
+    finally:
+        reader.close()
+
+
+def test_survivors_are_tested_again_when_their_test_files_change(surviving_mutants_filesystem):
+    def run():
+        result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--test-time-base=15.0", "--simple-output"], catch_exceptions=False)
+        print(repr(result.output))
+        return result.output
+
+    assert 'SURVIVED 2' in run()
+
+    with open(surviving_mutants_filesystem / 'tests' / 'test_foo.py', 'a') as f:
+        f.write('\ndef test_more_of_nothing(): assert True\n')
+    assert 'SURVIVED 2' in run()
+
+    # the survivors weren't tested against the new file yet
+    with open(surviving_mutants_filesystem / 'tests' / 'test_bar.py', 'w') as f:
+        f.write('from foo import foo\n\ndef test_foo():\n    assert foo(1, 2) == 3\n')
+    assert 'KILLED 2' in run()
+
+
+@pytest.fixture
+def scoped_mutants_filesystem(tmpdir):
+    foo_py = """def foo(a, b):
+    return a + b
+
+
+def bar(a):
+    return a * 2 + baz()
+
+
+def baz():
+    return 1
+"""
+    # the tests only check something with MUTMUT_TEST_STRICT set, so what
+    # they kill changes without a change to the test files
+    test_py = """import os
+from foo import foo, bar
+
+def test_foo():
+    if os.environ.get('MUTMUT_TEST_STRICT'):
+        assert foo(1, 2) == 3
+        assert bar(2) == 5
+"""
+    create_filesystem(tmpdir, foo_py, test_py)
+
+    yield tmpdir
+
+    # This is a hack to get pony to forget about the old db file
+    # otherwise Pony thinks we've already created the tables
+    import mutmut.cache
+    mutmut.cache.db.provider = None
+    mutmut.cache.db.schema = None
+
+
+def test_only_mutants_of_changed_scopes_are_tested_again(scoped_mutants_filesystem, monkeypatch):
+    def run():
+        result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--test-time-base=15.0", "--simple-output"], catch_exceptions=False)
+        print(repr(result.output))
+        return result.output
+
+    assert 'KILLED 0  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 5' in run()
+    monkeypatch.setenv('MUTMUT_TEST_STRICT', '1')
+
+    # baz changed, bar calls it, so their mutants are tested again and killed,
+    # the mutant of foo keeps its result
+    foo_py = (scoped_mutants_filesystem / 'foo.py').read().replace('return 1', 'return 2 - 1')
+    (scoped_mutants_filesystem / 'foo.py').write(foo_py)
+    assert 'KILLED 6  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 1' in run()
+
+    # reformatting foo keeps the result of its mutant
+    (scoped_mutants_filesystem / 'foo.py').write(foo_py.replace('a + b', 'a+b  # the sum'))
+    assert 'KILLED 6  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 1' in run()
+
+
+def test_mutants_of_scopes_with_the_same_code_are_tested_again(scoped_mutants_filesystem):
+    from pony.orm import db_session
+    from mutmut.cache import Mutant
+
+    foo_py = """class A:
+    def m(self):
+        return 1
+
+
+class B:
+    def m(self):
+        return 1
+"""
+    (scoped_mutants_filesystem / 'foo.py').write(foo_py)
+    (scoped_mutants_filesystem / 'tests' / 'test_foo.py').write('from foo import A\n\ndef test_a():\n    assert A().m() == 1\n')
+
+    def run():
+        result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--test-time-base=15.0", "--simple-output"], catch_exceptions=False)
+        print(repr(result.output))
+        with db_session:
+            return sorted((m.line.line, m.status) for m in Mutant.select())
+
+    assert run() == [('        return 1', 'bad_survived'), ('        return 1', 'ok_killed')]
+
+    # the same fingerprint and place in both methods, which result belongs
+    # to which can't be told from the code
+    a, b = foo_py.split('\n\n\n')
+    (scoped_mutants_filesystem / 'foo.py').write(b.replace('1', '1  # b') + '\n\n\n' + a.replace('1', '1  # a') + '\n')
+    assert run() == [('        return 1  # a', 'ok_killed'), ('        return 1  # b', 'bad_survived')]
+
+
 def test_show(surviving_mutants_filesystem):
     CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--test-time-base=15.0"], catch_exceptions=False)
     result = CliRunner().invoke(climain, ['show'])
@@ -704,3 +892,304 @@ def test_html_output(surviving_mutants_filesystem):
             '<table><thead><tr><th>File</th><th>Total</th><th>Killed</th><th>% killed</th><th>Survived</th></thead>'
             '<tr><td><a href="foo.py.html">foo.py</a></td><td>2</td><td>0</td><td>0.00</td><td>2</td>'
             '</table></body></html>')
+
+
+def test_full_run_parallel_jobs(filesystem):
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--simple-output", "--jobs=2"], catch_exceptions=False)
+    print(repr(result.output))
+    assert result.exit_code == 0
+    assert '14/14  KILLED 14  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+    with open(os.path.join(str(filesystem), 'foo.py')) as f:
+        assert f.read() == file_to_mutate_contents
+
+
+def test_full_run_use_schemata(filesystem):
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--simple-output", "--use-schemata"], catch_exceptions=False)
+    print(repr(result.output))
+    assert result.exit_code == 0
+    assert '14/14  KILLED 14  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+    with open(os.path.join(str(filesystem), 'foo.py')) as f:
+        assert f.read() == file_to_mutate_contents
+
+
+@pytest.mark.parametrize('use_schemata', [False, True])
+def test_full_run_use_schemata_with_a_mutant_that_does_not_compile(tmpdir, use_schemata):
+    create_filesystem(tmpdir, "def foo(kwargs):\n    return {**kwargs, 'a': 1}\n", "from foo import *\ndef test_foo():\n    assert foo({})\n")
+    args = ['run', '--paths-to-mutate=foo.py', "--simple-output"]
+    if use_schemata:
+        args.append("--use-schemata")
+    try:
+        result = CliRunner().invoke(climain, args, catch_exceptions=False)
+        print(repr(result.output))
+        # {**kwargs} -> {*kwargs} doesn't compile, "XXaXX" and 2 survive in both modes
+        assert '3/3  KILLED 1  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 2  SKIPPED 0' in repr(result.output)
+    finally:
+        import mutmut.cache
+        mutmut.cache.db.provider = None
+        mutmut.cache.db.schema = None
+
+
+def test_use_coverage_tests_placeholder(filesystem):
+    # record which test covers which line
+    subprocess.run([sys.executable, "-m", "pytest", "--cov=.", "--cov-context=test", "tests"])
+    assert os.path.isfile('.coverage')
+
+    result = CliRunner().invoke(climain, [
+        'run', '--paths-to-mutate=foo.py', "--simple-output", "--use-coverage",
+        "--runner=python -m pytest -x -p no:cacheprovider {tests}",
+    ], catch_exceptions=False)
+    print(repr(result.output))
+    # "c = None" breaks "c += 1" at import time, pytest reports that as a
+    # collection error (exit code 2) which kills the mutant like a failing test
+    assert result.exit_code == 0
+    assert '14/14  KILLED 14  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+
+    # the baseline records the durations of the single tests for the timeouts
+    from mutmut.cache import cached_test_durations
+    assert list(cached_test_durations()) == ['tests/test_foo.py::test_foo']
+
+
+def test_use_coverage_tests_placeholder_with_renamed_tests(filesystem):
+    subprocess.run([sys.executable, "-m", "pytest", "--cov=.", "--cov-context=test", "tests"])
+    # the coverage data still has the old name of the test
+    with open(os.path.join(str(filesystem), 'tests', 'test_foo.py'), 'w') as f:
+        f.write(test_file_contents.replace('def test_foo(', 'def test_foo_renamed('))
+
+    result = CliRunner().invoke(climain, [
+        'run', '--paths-to-mutate=foo.py', "--simple-output", "--use-coverage",
+        "--runner=python -m pytest -x -p no:cacheprovider {tests}",
+        # the mutant runs pytest twice, that's not suspicious
+        "--test-time-base=10",
+    ], catch_exceptions=False)
+    print(repr(result.output))
+    # pytest exits with 4 for the unknown test, the mutants are tested against the whole suite
+    assert '14/14  KILLED 14  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+
+
+def test_use_coverage_tests_placeholder_in_parallel_jobs(filesystem):
+    with open(os.path.join(str(filesystem), 'tests', 'test_other.py'), 'w') as f:
+        f.write('def test_other():\n    pass\n')
+    subprocess.run([sys.executable, "-m", "pytest", "--cov=.", "--cov-context=test", "tests"])
+
+    result = CliRunner().invoke(climain, [
+        'run', '--paths-to-mutate=foo.py', "--simple-output", "--use-coverage", "--jobs=2",
+        "--runner=python -m pytest -x -p no:cacheprovider {tests}",
+        # two pytest processes at once are slower than the baseline, that's not suspicious
+        "--test-time-base=10",
+    ], catch_exceptions=False)
+    print(repr(result.output))
+    assert '14/14  KILLED 14  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+
+    # the workers find the covering tests although they run in a workspace, so
+    # the mutants in foo() are only tested against tests/test_foo.py (module level
+    # code runs at collection time, its mutants are tested against the whole suite)
+    from mutmut.cache import FingerprintOfTestFiles, init_db
+    from pony.orm import db_session, select
+
+    @init_db
+    @db_session
+    def tested_files():
+        return {
+            tuple(name for name, hash in json.loads(x.files) if hash is not None)
+            for x in select(x for x in FingerprintOfTestFiles)
+        }
+
+    assert ('tests/test_foo.py',) in tested_files()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork is only available on posix systems')
+def test_full_run_use_fork_server(filesystem):
+    result = CliRunner().invoke(climain, [
+        'run', '--paths-to-mutate=foo.py', "--simple-output", "--use-fork-server",
+        "--runner=python -m pytest -x -p no:cacheprovider",
+    ], catch_exceptions=False)
+    print(repr(result.output))
+    # the collection error of "c = None" kills the mutant, see above
+    assert '14/14  KILLED 14  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+    with open(os.path.join(str(filesystem), 'foo.py')) as f:
+        assert f.read() == file_to_mutate_contents
+
+
+def test_killed_by_is_recorded_and_tried_first(filesystem):
+    result = CliRunner().invoke(climain, [
+        'run', '--paths-to-mutate=foo.py', "--simple-output",
+        "--runner=python -m pytest -x -p no:cacheprovider {tests}",
+    ], catch_exceptions=False)
+    print(repr(result.output))
+    assert '14/14  KILLED 14  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+
+    from mutmut.cache import killing_tests
+    assert killing_tests('foo.py', 0) == ['tests/test_foo.py::test_foo']
+    assert killing_tests('foo.py', 100) == []
+    assert killing_tests('bar.py', 0) == []
+
+
+def test_full_run_use_import_hook(filesystem):
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--simple-output", "--use-import-hook"], catch_exceptions=False)
+    print(repr(result.output))
+    assert result.exit_code == 0
+    assert '14/14  KILLED 14  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+    assert not os.path.exists(os.path.join(str(filesystem), 'foo.py.bak'))
+
+
+def test_full_run_use_import_hook_in_subprocess(filesystem):
+    result = CliRunner().invoke(climain, [
+        'run', '--paths-to-mutate=foo.py', "--simple-output", "--use-import-hook",
+        "--runner=python -m pytest -x -p no:cacheprovider",
+    ], catch_exceptions=False)
+    print(repr(result.output))
+    # the collection error of "c = None" kills the mutant, see above
+    assert '14/14  KILLED 14  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+    with open(os.path.join(str(filesystem), 'foo.py')) as f:
+        assert f.read() == file_to_mutate_contents
+
+    # without {tests} every mutant runs the whole suite, the durations of the tests aren't needed
+    from mutmut.cache import cached_test_durations
+    assert cached_test_durations() is None
+
+
+def test_use_schemata_and_use_import_hook_are_exclusive(filesystem):
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--use-schemata", "--use-import-hook"])
+    assert result.exit_code == 2
+    assert "You can't combine --use-schemata and --use-import-hook" in result.output
+
+
+def test_serve_with_remote_workers(filesystem, tmpdir_factory):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+
+    coordinator = subprocess.Popen(
+        [sys.executable, '-m', 'mutmut', 'serve', '--paths-to-mutate=foo.py', '--simple-output',
+         '--bind=127.0.0.1:{}'.format(port)],
+        cwd=str(filesystem),
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        env=dict(os.environ, MUTMUT_AUTHKEY='secret'),
+    )
+    authkey_file = tmpdir_factory.mktemp('secrets') / 'authkey'
+    authkey_file.write('secret\n')
+    workers = []
+    for authkey_option in ['--authkey-file={}'.format(authkey_file), '--authkey=secret']:
+        checkout = tmpdir_factory.mktemp('checkout')
+        create_filesystem(checkout, file_to_mutate_contents, test_file_contents)
+        workers.append(subprocess.Popen(
+            [sys.executable, '-m', 'mutmut', 'worker', '--connect=127.0.0.1:{}'.format(port), authkey_option],
+            cwd=str(checkout),
+        ))
+    os.chdir(str(filesystem))
+
+    output, _ = coordinator.communicate(timeout=120)
+    print(repr(output))
+    assert coordinator.returncode == 0
+    assert 'mutmut worker --connect 127.0.0.1:{}\n'.format(port) in output
+    assert 'secret' not in output
+    assert '14/14  KILLED 14  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in output
+    for worker in workers:
+        assert worker.wait(timeout=60) == 0
+
+    result = CliRunner().invoke(climain, ['results'], catch_exceptions=False)
+    assert 'Survived' not in result.output
+
+
+def test_serve_writes_a_generated_authkey_to_a_file(tmpdir, capsys):
+    os.chdir(str(tmpdir))
+    authkey = serve_authkey(None, None)
+    assert authkey not in capsys.readouterr().out
+    assert (tmpdir / AUTHKEY_FILENAME).read().strip() == authkey
+    if os.name != 'nt':
+        assert stat.S_IMODE(os.stat(AUTHKEY_FILENAME).st_mode) == 0o600
+
+    assert serve_authkey(None, AUTHKEY_FILENAME) == authkey
+    assert serve_authkey('secret', AUTHKEY_FILENAME) == 'secret'
+
+
+def test_worker_needs_an_authkey(monkeypatch):
+    monkeypatch.delenv('MUTMUT_AUTHKEY', raising=False)
+    result = CliRunner().invoke(climain, ['worker', '--connect=127.0.0.1:1'])
+    assert result.exit_code == 2
+    assert 'Give the shared secret' in result.output
+
+
+def test_detect_equivalent(equivalent_mutants_filesystem):
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--simple-output", "--detect-equivalent"], catch_exceptions=False)
+    print(repr(result.output))
+    assert '6/6  KILLED 5  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0  EQUIVALENT 1' in repr(result.output)
+
+    result = CliRunner().invoke(climain, ['result-ids', 'equivalent'], catch_exceptions=False)
+    assert result.output.strip() == '2'
+
+    # without the flag the equivalent mutant is tested like any other
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--simple-output"], catch_exceptions=False)
+    assert '6/6  KILLED 5  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 1  SKIPPED 0  EQUIVALENT 0' in repr(result.output)
+
+
+def test_broken_mutants_are_killed_without_running_the_tests(broken_mutants_filesystem):
+    from pony.orm import db_session
+    from mutmut.cache import Mutant
+
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--simple-output", "--check-import"], catch_exceptions=False)
+    print(repr(result.output))
+    assert '3/3  KILLED 3  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+    with db_session:
+        assert sorted(m.killed_by for m in Mutant.select()) == ['', KILLED_BY_COMPILE_ERROR, KILLED_BY_IMPORT_ERROR]
+
+
+def test_since(filesystem):
+    def git(*args):
+        subprocess.check_call(['git', '-c', 'user.name=mutmut', '-c', 'user.email=mutmut@example.com'] + list(args), stdout=subprocess.DEVNULL)
+
+    git('init', '-q')
+    git('add', '.')
+    git('commit', '-q', '-m', 'initial')
+
+    with open('foo.py') as f:
+        source = f.read()
+    with open('foo.py', 'w') as f:
+        f.write(source.replace('return a < b', 'return a < b  # changed'))
+
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--simple-output", "--since=HEAD"], catch_exceptions=False)
+    print(repr(result.output))
+    # only the mutant in the changed function foo
+    assert '1/1  KILLED 1  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--since=no-such-ref"])
+    assert result.exit_code == 2
+    assert 'Could not find the changes since no-such-ref' in result.output
+
+
+def test_sample(filesystem):
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--simple-output", "--sample=50%"], catch_exceptions=False)
+    print(repr(result.output))
+    assert result.exit_code == 0
+    assert '7/7  KILLED 7  TIMEOUT 0  SUSPICIOUS 0  SURVIVED 0  SKIPPED 0' in repr(result.output)
+    assert 'Mutation score 100.0% (95% confidence interval 64.6% to 100.0%) from a sample of 7 of 14 mutants' in result.output
+
+    result = CliRunner().invoke(climain, ['run', '--paths-to-mutate=foo.py', "--sample=half"])
+    assert result.exit_code == 2
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='process groups are posix only')
+def test_popen_streaming_output_timeout_kills_process_group(tmpdir):
+    marker = tmpdir / 'marker'
+    script = tmpdir / 'spawn_child.py'
+    script.write(
+        'import subprocess, sys, time\n'
+        'subprocess.Popen([sys.executable, "-c", "import time; time.sleep(1); open(%r, \'w\')"])\n'
+        'time.sleep(4)\n' % str(marker)
+    )
+    with pytest.raises(TimeoutError):
+        popen_streaming_output(PYTHON + ' ' + str(script), lambda line: line, timeout=0.5)
+    sleep(1.5)
+    assert not marker.exists()
+
+
+def test_popen_streaming_output_discard_output():
+    mock = MagicMock()
+    returncode = popen_streaming_output(
+        PYTHON + ' -c "print(\'first\'); raise SystemExit(3)"',
+        callback=mock,
+        discard_output=True,
+    )
+    assert returncode == 3
+    mock.assert_not_called()
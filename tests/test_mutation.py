@@ -4,7 +4,7 @@ import pytest
 from parso import parse
 
 from mutmut import mutate, ALL, Context, list_mutations, RelativeMutationID, \
-    array_subscript_pattern, function_call_pattern, ASTPattern
+    array_subscript_pattern, function_call_pattern, import_from_star_pattern, ASTPattern
 
 
 def test_matches_py3():
@@ -26,6 +26,23 @@ def test_matches():
     assert function_call_pattern.matches(node=node)
 
 
+def test_matches_checks_types_before_walking_the_pattern():
+    source = 'from foo import *\nx = foo[bar] + baz(1, *a) * foo(2)[3]\ndef f(*args, **kwargs): pass\n'
+
+    def all_leaves(node):
+        if not hasattr(node, 'children'):
+            yield node
+        for child in getattr(node, 'children', []):
+            yield from all_leaves(child)
+
+    for pattern in [array_subscript_pattern, function_call_pattern, import_from_star_pattern]:
+        for node in all_leaves(parse(source)):
+            walked = pattern.matches(node=node, pattern=pattern.pattern)
+            assert pattern.matches(node=node) == walked
+            if walked:
+                assert pattern.may_match(node)
+
+
 def test_ast_pattern_for_loop():
     p = ASTPattern(
         """
@@ -245,6 +262,25 @@ def test_mutate_both():
     assert mutate(Context(source=source, mutation_id=mutations[1])) == ('a = None', 1)
 
 
+@pytest.mark.parametrize(
+    'source', [
+        'a = b + c',
+        'def foo(a, b=3):\n    """doc"""\n    return a[0] < b or not a\n',
+        'x = f"{a} b"\nif x is not None:\n    del y[1:2]\n',
+        '@decorator\nclass Foo:\n    z: int = 1\n    def bar(self):\n        return dict(a=1, b=2)\n',
+        'while True:\n    break\nelse:\n    lambda: 0\n',
+        'a = 1',
+    ]
+)
+def test_listed_edits_match_mutate(source):
+    mutations = list_mutations(Context(source=source))
+    assert mutations
+    for mutation_id in mutations:
+        assert mutation_id.edit is not None
+        parsed_id = RelativeMutationID(mutation_id.line, mutation_id.index, mutation_id.line_number)
+        assert mutate(Context(source=source, mutation_id=mutation_id)) == mutate(Context(source=source, mutation_id=parsed_id))
+
+
 def test_perform_one_indexed_mutation():
     assert mutate(Context(source='1+1', mutation_id=RelativeMutationID(line='1+1', index=0, line_number=0))) == ('2+1', 1)
     assert mutate(Context(source='1+1', mutation_id=RelativeMutationID('1+1', 1, line_number=0))) == ('1-1', 1)
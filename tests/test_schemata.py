@@ -0,0 +1,53 @@
+from mutmut import Context, list_mutations
+from mutmut.schemata import create_instrumented_source, module_level_functions, mutant_key, MUTANT_UNDER_TEST
+
+source = """import os
+
+def add(a, b):
+    return a + b
+
+c = 1
+"""
+
+
+def run_instrumented(instrumented, monkeypatch, key):
+    if key is None:
+        monkeypatch.delenv(MUTANT_UNDER_TEST, raising=False)
+    else:
+        monkeypatch.setenv(MUTANT_UNDER_TEST, key)
+    namespace = {}
+    exec(compile(instrumented, 'foo.py', 'exec'), namespace)
+    return namespace
+
+
+def test_module_level_functions():
+    assert module_level_functions(source) == [('add', 4, 2, 3)]
+
+
+def test_create_instrumented_source(monkeypatch):
+    context = Context(source=source, filename='foo.py')
+    mutation_ids = list_mutations(context)
+    instrumented, selectable = create_instrumented_source(context, mutation_ids)
+
+    # a + b -> a - b is in the function, c = 1 is module level code
+    assert len(mutation_ids) == 3
+    assert selectable == {mutation_ids[0]}
+
+    assert run_instrumented(instrumented, monkeypatch, key=None)['add'](1, 2) == 3
+    assert run_instrumented(instrumented, monkeypatch, key=mutant_key('foo.py', mutation_ids[0]))['add'](1, 2) == -1
+
+
+def test_create_instrumented_source_without_functions():
+    context = Context(source='c = 1\n', filename='foo.py')
+    assert create_instrumented_source(context, list_mutations(context)) == ('c = 1\n', set())
+
+
+def test_create_instrumented_source_skips_variants_that_do_not_compile(monkeypatch):
+    context = Context(source="def foo(kwargs):\n    return {**kwargs, 'a': 1}\n", filename='foo.py')
+    mutation_ids = list_mutations(context)
+    instrumented, selectable = create_instrumented_source(context, mutation_ids)
+
+    # {**kwargs} -> {*kwargs} is a syntax error, the other mutants are selectable
+    assert len(mutation_ids) == 3
+    assert selectable == set(mutation_ids[1:])
+    assert run_instrumented(instrumented, monkeypatch, key=None)['foo']({}) == {'a': 1}